@@ -1,11 +1,27 @@
 from .utils import *
 from .errors import *
 from .constants import *
+from .cache import *
+from .censor import *
+from .scheduler import *
+from .snipes import *
+from .spam import *
+from .bulk import *
+from .links import *
+from .purge import *
+from .pages import *
+from .duel import *
+from .web import *
+from .help import *
+from .logs import *
+from .metrics import *
+from .slowlog import *
+from .schema import *
+from .modlog import *
+from .pipeline import *
 import logging
 
 """
 The assets package for this bot
 Contains some simple stuff to help it run and stuff
 """
-
-
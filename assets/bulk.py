@@ -0,0 +1,291 @@
+import abc
+import asyncio
+import logging
+import time
+from datetime import datetime as dt
+
+import discord
+from pymongo import ReturnDocument
+
+from .constants import MAIN, GREEN, RED
+
+__all__ = ('gather_limited', 'BulkAction', 'AddRole', 'RemoveRole', 'BulkJobs')
+
+log = logging.getLogger(__name__)
+
+
+async def gather_limited(items, worker, limit=5):
+    """
+    Run `worker(item)` for every item with at most `limit` running at once.
+
+    Workers are fed from a shared iterator instead of making one task per item, so this
+    is fine to use on tens of thousands of members. Returns (succeeded, failed) counts,
+    exceptions are logged and counted instead of being raised.
+    """
+    items = iter(items)
+    counts = [0, 0]
+
+    async def runner():
+        for item in items:
+            try:
+                await worker(item)
+                counts[0] += 1
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                counts[1] += 1
+                log.debug("Bulk worker failed for %r: %r", item, e)
+
+    await asyncio.gather(*(runner() for _ in range(max(1, limit))))
+    return tuple(counts)
+
+
+class BulkAction(abc.ABC):
+    """
+    Something that gets done to a lot of members at once.
+
+    `targets` picks the members that still need it, so resuming a job never does
+    anything twice, and `apply` does it to one member.
+    Subclasses register themselves under their `name`, which is what gets stored in the job record.
+    """
+    actions = {}
+    name = None
+    description = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name:
+            BulkAction.actions[cls.name] = cls
+
+    def __init__(self, guild, params):
+        self.guild = guild
+        self.params = params
+
+    @abc.abstractmethod
+    def targets(self):
+        ...
+
+    @abc.abstractmethod
+    async def apply(self, member):
+        ...
+
+
+class _RoleAction(BulkAction):
+    def __init__(self, guild, params):
+        super().__init__(guild, params)
+        self.role = guild.get_role(params['role_id'])
+        self.has_role = guild.get_role(params['has_role_id'])
+        if self.role is None or self.has_role is None:
+            raise ValueError("The role for this job no longer exists")
+
+        self.reason = params.get('reason')
+
+
+class AddRole(_RoleAction):
+    name = 'add_role'
+
+    @property
+    def description(self):
+        return f"Adding {self.role.mention} to members with {self.has_role.mention}"
+
+    def targets(self):
+        return [m for m in self.has_role.members if self.role not in m.roles]
+
+    async def apply(self, member):
+        await member.add_roles(self.role, reason=self.reason, atomic=True)
+
+
+class RemoveRole(_RoleAction):
+    name = 'remove_role'
+
+    @property
+    def description(self):
+        return f"Removing {self.role.mention} from members with {self.has_role.mention}"
+
+    def targets(self):
+        return [m for m in self.has_role.members if self.role in m.roles]
+
+    async def apply(self, member):
+        await member.remove_roles(self.role, reason=self.reason, atomic=True)
+
+
+class BulkJobs:
+    """
+    Runs bulk actions in the background and keeps a record of each one in the `jobs` collection.
+
+    discord.py already queues requests per rate limit bucket, so a handful of concurrent
+    workers is enough to keep the bucket busy without ever sitting idle between requests.
+    Progress is saved every `save_every` members and shown by editing one status message,
+    at most once every `edit_interval` seconds. Jobs that got cancelled, or were running when
+    the bot went down, can be resumed by ID.
+    """
+
+    def __init__(self, bot, collection, concurrency=5, edit_interval=5, save_every=100):
+        self.bot = bot
+        self.collection = collection
+        self.concurrency = concurrency
+        self.edit_interval = edit_interval
+        self.save_every = save_every
+        self._tasks = {}  # (guild_id, job_id) -> task
+
+    async def _next_id(self, guild_id):
+        data = await self.bot.counters.find_one_and_update(
+            {"_id": f"jobs-{guild_id}"}, {'$inc': {"job_id": 1}},
+            upsert=True, return_document=ReturnDocument.AFTER)
+        return data['job_id']
+
+    def is_running(self, guild_id, job_id):
+        task = self._tasks.get((guild_id, job_id))
+        return task is not None and not task.done()
+
+    async def get(self, guild_id, job_id):
+        return await self.collection.find_one({"guild_id": guild_id, "job_id": job_id})
+
+    async def start(self, ctx, action, **params):
+        """
+        Create a job for the invoking guild and start it. Returns the job record.
+        """
+        runner = BulkAction.actions[action](ctx.guild, params)
+        job = {
+            "guild_id": ctx.guild.id,
+            "job_id": await self._next_id(ctx.guild.id),
+            "action": action,
+            "params": params,
+            "author_id": ctx.author.id,
+            "channel_id": ctx.channel.id,
+            "status": "running",
+            "done": 0,
+            "failed": 0,
+            "created": dt.utcnow(),
+        }
+        await self.collection.insert_one(job)
+        self._spawn(job, runner, ctx.channel)
+        return job
+
+    async def resume(self, guild, channel, job_id):
+        """
+        Pick a stopped job back up. Raises ValueError if it can't be resumed.
+        """
+        job = await self.get(guild.id, job_id)
+        if job is None:
+            raise ValueError(f"There is no job with the ID `{job_id}`")
+
+        if self.is_running(guild.id, job_id):
+            raise ValueError(f"Job `{job_id}` is already running")
+
+        if job['status'] == 'finished':
+            raise ValueError(f"Job `{job_id}` has already finished")
+
+        runner = BulkAction.actions[job['action']](guild, job['params'])
+        # whoever failed last time is still a target, so they get another go
+        await self.collection.update_one({"_id": job['_id']}, {'$set': {"status": "running", "failed": 0}})
+        job.update(status='running', failed=0)
+        self._spawn(job, runner, channel)
+        return job
+
+    async def cancel(self, guild_id, job_id):
+        """
+        Stop a running job. Returns whether there was one to stop.
+        """
+        task = self._tasks.get((guild_id, job_id))
+        if task is None or task.done():
+            return False
+
+        task.cancel()
+        return True
+
+    def _spawn(self, job, runner, channel):
+        key = job['guild_id'], job['job_id']
+        self._tasks[key] = self.bot.loop.create_task(self._run(job, runner, channel))
+        self._tasks[key].add_done_callback(lambda _: self._tasks.pop(key, None))
+
+    def _embed(self, job, runner, total, status):
+        done = job['done'] + job['failed']
+        colour = {'running': MAIN, 'finished': GREEN}.get(status, RED)
+        em = discord.Embed(
+            title=f"Job #{job['job_id']}: {status}",
+            description=f"{runner.description}\n`{done}`/`{total}` members done"
+                        + (f", `{job['failed']}` failed" if job['failed'] else ""),
+            colour=colour,
+            timestamp=dt.utcnow())
+        if status == 'running':
+            em.set_footer(text=f"Cancel with 'jobs cancel {job['job_id']}'")
+
+        elif status != 'finished':
+            em.set_footer(text=f"Resume with 'jobs resume {job['job_id']}'")
+
+        return em
+
+    async def _run(self, job, runner, channel):
+        members = runner.targets()
+        total = job['done'] + job['failed'] + len(members)
+        last_edit, last_save = time.monotonic(), 0
+        status, message = 'running', None
+
+        async def save():
+            await self.collection.update_one(
+                {"_id": job['_id']}, {'$set': {"done": job['done'], "failed": job['failed'], "status": status}})
+
+        async def worker(member):
+            nonlocal last_edit, last_save
+            try:
+                await runner.apply(member)
+                job['done'] += 1
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                # left the guild, role moved above us etc, not worth stopping for, but it has to be counted
+                job['failed'] += 1
+                if not isinstance(e, discord.HTTPException):
+                    log.exception("Bulk job %s failed on member %s", job['job_id'], member.id)
+
+            processed = job['done'] + job['failed']
+            if processed - last_save >= self.save_every:
+                last_save = processed
+                await save()
+
+            if message is not None and time.monotonic() - last_edit >= self.edit_interval:
+                last_edit = time.monotonic()
+                try:
+                    await message.edit(embed=self._embed(job, runner, total, status))
+
+                except discord.HTTPException:
+                    pass
+
+        try:
+            message = await channel.send(embed=self._embed(job, runner, total, 'running'))
+            await gather_limited(members, worker, self.concurrency)
+            status = 'finished'
+
+        except asyncio.CancelledError:
+            status = 'cancelled'
+
+        except Exception:
+            log.exception("Bulk job %s in guild %s failed", job['job_id'], job['guild_id'])
+            status = 'failed'
+
+        finally:
+            # whatever happened, the record has to say so, otherwise it's stuck on running forever
+            try:
+                await asyncio.shield(save())
+
+            except Exception:
+                log.exception("Saving bulk job %s in guild %s failed", job['job_id'], job['guild_id'])
+
+        if message is not None:
+            try:
+                await message.edit(embed=self._embed(job, runner, total, status))
+
+            except discord.HTTPException:
+                pass
+
+    async def mark_interrupted(self):
+        """
+        Anything still marked as running from before a restart can't be, so flag it for resuming
+        """
+        await self.collection.update_many({"status": "running"}, {'$set': {"status": "interrupted"}})
+
@@ -0,0 +1,276 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+import discord
+
+__all__ = ('LRUCache', 'GuildConfigCache', 'UserResolver', 'Blacklist')
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A small LRU cache with an optional idle TTL.
+
+    Entries are kept in access order, so the least recently used (and therefore the
+    longest idle) entries are always at the front and can be evicted cheaply.
+    """
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> [last access, value]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        now = time.monotonic()
+        if self.ttl is not None and now - entry[0] >= self.ttl:
+            del self._entries[key]
+            self.misses += 1
+            return default
+
+        entry[0] = now
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key, value):
+        self._entries[key] = [time.monotonic(), value]
+        self._entries.move_to_end(key)
+        self.evict()
+
+    def pop(self, key, default=None):
+        entry = self._entries.pop(key, None)
+        return default if entry is None else entry[1]
+
+    def clear(self):
+        self._entries.clear()
+
+    def peek(self, key, default=None):
+        """
+        Get an entry without touching its access time or the hit counters
+        """
+        entry = self._entries.get(key)
+        return default if entry is None else entry[1]
+
+    def evict(self):
+        """
+        Drop idle entries from the front, then trim down to maxsize
+        """
+        if self.ttl is not None:
+            deadline = time.monotonic() - self.ttl
+            while self._entries:
+                key, entry = next(iter(self._entries.items()))
+                if entry[0] > deadline:
+                    break
+
+                del self._entries[key]
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class GuildConfigCache:
+    """
+    An in-memory view of the `config` collection.
+
+    Reads are served from memory, and writes go through `update` so the database and the
+    cache never disagree. Guilds that haven't been looked at for `ttl` seconds are evicted.
+    The documents handed out are shared, so callers should copy anything they want to mutate.
+    """
+
+    def __init__(self, collection, maxsize=5000, ttl=900):
+        self.collection = collection
+        self._cache = LRUCache(maxsize, ttl)
+        self._pending = {}
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    async def get(self, guild_id):
+        """
+        Get a guild's config document, or None if the guild has none
+        """
+        data = self._cache.get(guild_id, _MISSING)
+        if data is not _MISSING:
+            return data
+
+        # only one lookup per guild is ever in flight, everyone else waits on it
+        task = self._pending.get(guild_id)
+        if task is None:
+            task = self._pending[guild_id] = asyncio.ensure_future(self._load(guild_id))
+
+        return await asyncio.shield(task)
+
+    async def _load(self, guild_id):
+        try:
+            data = await self.collection.find_one({"_id": guild_id})
+
+        finally:
+            task = self._pending.pop(guild_id, None)
+
+        # a write happened while we were waiting, so what we read may already be stale
+        if task is asyncio.current_task():
+            self._cache.set(guild_id, data)
+
+        return data
+
+    async def update(self, guild_id, update, upsert=False):
+        """
+        Write-through update. Takes the same update document as `update_one`.
+        """
+        self._pending.pop(guild_id, None)
+        result = await self.collection.update_one({"_id": guild_id}, update, upsert=upsert)
+
+        data = self._cache.peek(guild_id, _MISSING)
+        if data is _MISSING:
+            return result
+
+        if set(update) - {'$set', '$unset'}:
+            # not worth mirroring every operator, just read it again next time
+            self._cache.pop(guild_id)
+            return result
+
+        if data is None:
+            if not upsert:
+                return result
+
+            data = {"_id": guild_id}
+
+        else:
+            data = dict(data)
+
+        data.update(update.get('$set', {}))
+        for key in update.get('$unset', {}):
+            data.pop(key, None)
+
+        self._cache.set(guild_id, data)
+        return result
+
+    def evict(self, guild_id):
+        self._pending.pop(guild_id, None)
+        self._cache.pop(guild_id)
+
+
+class UserResolver:
+    """
+    Turns user IDs into users without hammering the API.
+
+    The client's own cache is tried first, then users we've fetched before (kept for `ttl`
+    seconds), and only then the API. Deleted accounts are remembered as missing for
+    `missing_ttl` seconds, and only one fetch per ID is ever in flight.
+    """
+
+    def __init__(self, bot, maxsize=2048, ttl=600, missing_ttl=300):
+        self.bot = bot
+        self._users = LRUCache(maxsize, ttl)
+        self._missing = LRUCache(maxsize, missing_ttl)
+        self._pending = {}
+
+    @property
+    def hits(self):
+        return self._users.hits
+
+    @property
+    def misses(self):
+        return self._users.misses
+
+    async def get(self, user_id):
+        """
+        Get a user, or None if they don't exist (or the API wouldn't say)
+        """
+        user = self.bot.get_user(user_id) or self._users.get(user_id)
+        if user is not None:
+            return user
+
+        if user_id in self._missing:
+            return None
+
+        task = self._pending.get(user_id)
+        if task is None:
+            task = self._pending[user_id] = asyncio.ensure_future(self._fetch(user_id))
+
+        return await asyncio.shield(task)
+
+    async def _fetch(self, user_id):
+        try:
+            user = await self.bot.fetch_user(user_id)
+
+        except discord.NotFound:
+            self._missing.set(user_id, True)
+            return None
+
+        except discord.HTTPException:
+            return None  # might work next time, so don't remember it
+
+        finally:
+            self._pending.pop(user_id, None)
+
+        self._users.set(user_id, user)
+        return user
+
+    async def resolve(self, user_ids):
+        """
+        Get a bunch of users at once, returns {user ID: user or None}.
+        Anything that has to be fetched is fetched concurrently.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        users = await asyncio.gather(*(self.get(user_id) for user_id in user_ids))
+        return dict(zip(user_ids, users))
+
+
+class Blacklist:
+    """
+    The set of blacklisted user IDs, mirrored from the `blacklists` collection.
+
+    Checked before every command, so it's kept entirely in memory. Changes made through
+    `add`/`remove` apply immediately, `load` picks up changes made by other instances.
+    """
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.loaded = False
+        self._ids = set()
+
+    def __len__(self):
+        return len(self._ids)
+
+    async def load(self):
+        self._ids = {document["_id"] async for document in self.collection.find({}, {"_id": 1})}
+        self.loaded = True
+
+    async def contains(self, user_id):
+        if not self.loaded:
+            await self.load()
+
+        return user_id in self._ids
+
+    async def add(self, user_id, reason):
+        await self.collection.update_one({"_id": user_id}, {'$set': {"reason": reason}}, upsert=True)
+        self._ids.add(user_id)
+
+    async def remove(self, user_id):
+        """
+        Returns whether the user was blacklisted
+        """
+        result = await self.collection.delete_one({"_id": user_id})
+        self._ids.discard(user_id)
+        return bool(result.deleted_count)
@@ -0,0 +1,137 @@
+import os
+import re
+import unicodedata
+import weakref
+from functools import lru_cache
+
+__all__ = ('CensorMatcher', 'compile_censor', 'load_wordlist', 'normalize_words')
+
+# the usual ways people dodge a word filter
+LEETSPEAK = str.maketrans({
+    '@': 'a', '4': 'a',
+    '8': 'b',
+    '3': 'e',
+    '1': 'i', '!': 'i',
+    '0': 'o',
+    '$': 's', '5': 's',
+    '7': 't', '+': 't',
+})
+# just the digits, punctuation only stands in for a letter when it's part of a word
+LEET_DIGITS = str.maketrans({k: v for k, v in LEETSPEAK.items() if chr(k).isdigit()})
+MARKS = re.compile('[\u0300-\u036f\u00ad\u200b-\u200f\u2060\ufeff]')  # accents, soft hyphens, zero width
+PUNCTUATION = re.compile(r'[^\w\s]+')
+REPEATS = re.compile(r'(.)\1+')
+
+_matchers = weakref.WeakValueDictionary()
+
+
+def _glue(words):
+    # glue spaced out letters back together
+    tokens, letters = [], []
+    for word in words:
+        if len(word) == 1:
+            letters.append(word)
+            continue
+
+        if letters:
+            tokens.append(''.join(letters))
+            letters.clear()
+
+        tokens.append(word)
+
+    if letters:
+        tokens.append(''.join(letters))
+
+    return tokens
+
+
+def normalize_words(text):
+    """
+    Normalize a message into lists of words.
+
+    Lowercases, undoes leetspeak, strips punctuation and invisible characters, and glues
+    spaced out letters back together, so `F.U.C.K`, `f u c k` and `fück` all come out the same.
+
+    There are two readings of the message. In one, symbols like `!` and `$` count as letters
+    (`sh!t`). In the other, punctuation splits words (`shit!`, `bad-word`). The second is
+    only returned if it's different.
+    """
+    text = MARKS.sub('', unicodedata.normalize('NFKD', text.lower()))
+    leet = _glue(PUNCTUATION.sub('', text.translate(LEETSPEAK)).split())
+    plain = _glue(PUNCTUATION.sub(' ', text.translate(LEET_DIGITS)).split())
+    return (leet,) if leet == plain else (leet, plain)
+
+
+class CensorMatcher:
+    """
+    A compiled word list.
+
+    Phrases are stored as tuples of normalized words, so a message is checked with one hash
+    lookup per word (per phrase length) and never matches inside a longer word.
+    Don't make these directly, use `compile_censor` so identical word lists share a matcher.
+    """
+    __slots__ = ('phrases', 'squeezed', 'longest', '__weakref__')
+
+    def __init__(self, words):
+        phrases = {tuple(normalize_words(word)[0]) for word in words}
+        phrases.discard(())
+
+        self.phrases = frozenset(phrases)
+        # the same phrases with repeated letters squashed, for catching `fuuuuck`
+        self.squeezed = frozenset(tuple(REPEATS.sub(r'\1', w) for w in phrase) for phrase in phrases)
+        self.longest = max(map(len, phrases), default=0)
+
+    def _search(self, tokens, phrases, changed=None):
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + self.longest, len(tokens)) + 1):
+                if tuple(tokens[start:end]) in phrases:
+                    # squeezed matches only count if a word was actually squeezed,
+                    # otherwise `as` would match `ass`
+                    if changed is None or any(changed[start:end]):
+                        return True
+
+        return False
+
+    def contains_profanity(self, text):
+        return self.contains_words(normalize_words(text))
+
+    def contains_words(self, variants):
+        """
+        Same as `contains_profanity`, for text that's already been through `normalize_words`
+        """
+        if not self.longest:
+            return False
+
+        return any(self._contains(tokens) for tokens in variants)
+
+    def _contains(self, tokens):
+        if self._search(tokens, self.phrases):
+            return True
+
+        squeezed = [REPEATS.sub(r'\1', token) for token in tokens]
+        changed = [a != b for a, b in zip(tokens, squeezed)]
+        return any(changed) and self._search(squeezed, self.squeezed, changed)
+
+
+def compile_censor(words):
+    """
+    Get the matcher for a word list. Guilds with the same list share one matcher.
+    """
+    key = frozenset(word for word in words if word)
+    matcher = _matchers.get(key)
+    if matcher is None:
+        matcher = _matchers[key] = CensorMatcher(key)
+
+    return matcher
+
+
+@lru_cache(maxsize=None)
+def load_wordlist(path):
+    """
+    Read a newline separated word list off disk, once per path
+    """
+    if not os.path.exists(path):
+        return ()
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return tuple(line.strip() for line in f if line.strip())
@@ -0,0 +1,215 @@
+import asyncio
+import multiprocessing
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .cache import LRUCache
+from .constants import DUEL_ATTACK_MESSAGES, DUEL_HEAL_MESSAGES
+
+__all__ = ('Turn', 'simulate_duel', 'EditBudget', 'DuelImages')
+
+AVATAR_SIZE = (164, 164)
+POSITIONS = ((39, 63), (416, 214))  # where the two avatars go on versus.jpg
+HEALTH_BARS = ((39, 233), (416, 196))  # and their health bars
+BAR_HEIGHT = 12
+
+# one turn of a duel, `line` is the diff line shown in the log, `heal` is whether it was a heal
+Turn = namedtuple('Turn', 'line heal health')
+
+
+def simulate_duel(p1, p2, rng=random):
+    """
+    Play a whole duel between two names up front.
+    Returns the turns, and the index (0 or 1) of the winner.
+    """
+    names, health = (p1, p2), [100, 100]
+    turns = []
+    attacker = 0
+    while health[0] > 0 and health[1] > 0:
+        defender = 1 - attacker
+        amount = rng.randint(10, 50)
+        # it's a 2/3 chance that they attack instead of healing
+        if rng.choice([True, False, True]):
+            line = '- ' + rng.choice(DUEL_ATTACK_MESSAGES).format(names[attacker], names[defender], amount)
+            health[defender] = max(0, health[defender] - amount)
+            turns.append(Turn(line, False, tuple(health)))
+
+        else:
+            line = '+ ' + rng.choice(DUEL_HEAL_MESSAGES).format(names[attacker], amount)
+            health[attacker] = min(100, health[attacker] + amount)
+            turns.append(Turn(line, True, tuple(health)))
+
+        attacker = defender
+
+    return turns, 0 if health[0] > health[1] else 1
+
+
+class EditBudget:
+    """
+    A token bucket per channel for message edits.
+
+    Discord only allows a handful of edits per channel every few seconds, so anything that
+    edits a message over and over (duels) takes a token first and waits if there are none left.
+    """
+
+    def __init__(self, rate=4, per=5.0):
+        self.rate = rate
+        self.per = per
+        self._buckets = {}  # channel id -> [tokens, last refill]
+
+    async def acquire(self, channel_id):
+        if len(self._buckets) > 1024:
+            self.sweep()
+
+        while True:
+            now = time.monotonic()
+            bucket = self._buckets.setdefault(channel_id, [self.rate, now])
+            bucket[0] = min(self.rate, bucket[0] + (now - bucket[1]) * self.rate / self.per)
+            bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return
+
+            await asyncio.sleep((1 - bucket[0]) * self.per / self.rate)
+
+    def sweep(self):
+        """
+        Forget channels whose buckets have filled back up
+        """
+        deadline = time.monotonic() - self.per
+        for key in [key for key, (_, last) in self._buckets.items() if last < deadline]:
+            del self._buckets[key]
+
+
+@lru_cache(maxsize=None)
+def _template(path):
+    """
+    The decoded versus image. Read once, only ever copied afterwards.
+    """
+    with Image.open(path) as image:
+        return image.convert('RGB')
+
+
+def _avatar(data):
+    with Image.open(BytesIO(data)) as image:
+        return image.convert('RGB').resize(AVATAR_SIZE)
+
+
+def _composite(path, avatars):
+    image = _template(path).copy()
+    for avatar, position in zip(avatars, POSITIONS):
+        image.paste(avatar, position)
+
+    buffer = BytesIO()
+    image.save(buffer, format='JPEG', quality=90)
+    buffer.seek(0)
+    return buffer
+
+
+def _draw_health(draw, health):
+    for (x, y), hp in zip(HEALTH_BARS, health):
+        draw.rectangle((x, y, x + AVATAR_SIZE[0], y + BAR_HEIGHT), fill=(40, 40, 40))
+        if hp:
+            colour = (67, 181, 129) if hp > 50 else (250, 166, 26) if hp > 20 else (240, 71, 71)
+            draw.rectangle((x, y, x + AVATAR_SIZE[0] * hp // 100, y + BAR_HEIGHT), fill=colour)
+
+
+def _animate(path, avatars, turns, frame_ms=1200, end_ms=4000):
+    """
+    The whole duel as a GIF. Runs in a worker process, so everything passed in has to pickle.
+    """
+    base = _template(path).copy()
+    for avatar, position in zip(avatars, POSITIONS):
+        base.paste(avatar, position)
+
+    font = ImageFont.load_default()
+    width, height = base.size
+    frames = []
+    for turn in [Turn('', False, (100, 100))] + [Turn(*turn) for turn in turns]:
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+        _draw_health(draw, turn.health)
+        if turn.line:
+            draw.rectangle((0, height - 28, width, height), fill=(0, 0, 0))
+            draw.text((10, height - 22), turn.line, font=font,
+                      fill=(67, 181, 129) if turn.heal else (240, 71, 71))
+
+        frames.append(frame.convert('P', palette=Image.ADAPTIVE))
+
+    buffer = BytesIO()
+    frames[0].save(buffer, format='GIF', save_all=True, append_images=frames[1:], loop=0,
+                   duration=[frame_ms] * (len(frames) - 1) + [end_ms])
+    return buffer.getvalue()
+
+
+class DuelImages:
+    """
+    Renders the versus image for duels.
+
+    All the PIL work runs in an executor so it never blocks the event loop. Resized avatars
+    are kept in an LRU keyed by avatar hash, so a change of avatar is a cache miss by itself.
+    Every render gets its own buffer, so concurrent duels can't overwrite each other.
+    Animated duels are heavier, so they go to a small process pool that's only started when needed.
+    The pool spawns fresh processes instead of forking, since a fork of the bot would copy its
+    event loop, sockets and any locks other threads happened to be holding.
+    """
+
+    def __init__(self, template, cache_size=256, executor=None, processes=1):
+        self.template = template
+        self.executor = executor
+        self.processes = processes
+        self._pool = None
+        self._avatars = LRUCache(cache_size)
+
+    @property
+    def hits(self):
+        return self._avatars.hits
+
+    @property
+    def misses(self):
+        return self._avatars.misses
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    @staticmethod
+    def _key(user):
+        return user.avatar or f'default-{user.default_avatar.value}'
+
+    async def avatar(self, user):
+        key = self._key(user)
+        avatar = self._avatars.get(key)
+        if avatar is None:
+            data = await user.avatar_url_as(format='png', size=128).read()
+            avatar = await asyncio.get_event_loop().run_in_executor(self.executor, _avatar, data)
+            self._avatars.set(key, avatar)
+
+        return avatar
+
+    async def render(self, *users):
+        """
+        Get a BytesIO with the JPEG for two users
+        """
+        avatars = await asyncio.gather(*(self.avatar(user) for user in users))
+        return await asyncio.get_event_loop().run_in_executor(self.executor, _composite, self.template, avatars)
+
+    async def animate(self, users, turns):
+        """
+        Get a BytesIO with a GIF of the whole duel
+        """
+        avatars = await asyncio.gather(*(self.avatar(user) for user in users))
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                             mp_context=multiprocessing.get_context('spawn'))
+
+        data = await asyncio.get_event_loop().run_in_executor(
+            self._pool, _animate, self.template, avatars, [tuple(turn) for turn in turns])
+        return BytesIO(data)
@@ -18,6 +18,10 @@ class InvalidLimit(commands.CommandError):
     """For the purge commands. Raises when the limit is either below 1 or above 1000"""
     pass
 
+class InvalidPurgeFilter(commands.CommandError):
+    """For the purge filter command. Raises when the filter expression can't be parsed"""
+    pass
+
 class BotRoleNotHighEnough(commands.CommandError):
     """Raises when the bot's role is not higher than the target's role"""
     pass
@@ -0,0 +1,106 @@
+from discord.ext import commands
+
+__all__ = ('HelpIndex', 'command_syntax')
+
+HIDDEN_COGS = {'Events', 'Help', 'Dev', 'Reaction Roles', 'ErrorHandler', 'Jishaku'}
+
+
+def command_syntax(command):
+    """
+    Get the syntax/usage for a command.
+    """
+    params = []
+
+    for key, value in command.params.items():
+        if key not in ("self", "ctx"):
+            value = str(value).lower()
+            if "optional" in value or "greedy" in value:
+                params.append(f"[{key}]")
+
+            else:
+                params.append(f"<{key}>")
+
+    params = " ".join(params)
+    return f"```{str(command.qualified_name)} {params}```"
+
+
+class HelpIndex:
+    """
+    Everything the help command and error handler need, worked out once.
+
+    Holds the command listing for every cog page, every command's syntax string and the
+    subcommands of every group. It's rebuilt lazily the next time it's used after `invalidate`,
+    which the bot calls whenever a cog is added or removed, and global_toggle calls after
+    enabling or disabling commands.
+    """
+
+    def __init__(self, bot, hidden_cogs=HIDDEN_COGS):
+        self.bot = bot
+        self.hidden_cogs = set(hidden_cogs)
+        self._built = False
+        self._cogs = []
+        self._pages = {}  # cog name -> (listing, number of commands)
+        self._syntax = {}  # qualified name -> syntax
+        self._subcommands = {}  # qualified name -> subcommand names
+
+    def invalidate(self):
+        self._built = False
+
+    def build(self):
+        self._cogs, self._pages = [], {}
+        self._syntax, self._subcommands = {}, {}
+
+        for command in self.bot.walk_commands():
+            self._syntax[command.qualified_name] = command_syntax(command)
+            if isinstance(command, commands.Group):
+                self._subcommands[command.qualified_name] = sorted(cmd.name for cmd in command.commands)
+
+        for name, cog in self.bot.cogs.items():
+            text, count = [], 0
+            for command in cog.walk_commands():
+                count += 1
+                if command.hidden or not command.enabled:
+                    text.append(f"-   {command.name}" if command.parent is not None else f"- {command.name}")
+
+                elif command.parent is not None:
+                    text.append(f"    {command.name}")
+
+                else:
+                    text.append(command.name)
+
+            self._pages[name] = ("\n".join(text) + "\n", count)
+            if name not in self.hidden_cogs:
+                self._cogs.append(name)
+
+        self._built = True
+
+    def _ensure(self):
+        if not self._built:
+            self.build()
+
+    @property
+    def cogs(self):
+        """
+        The cogs that get a page in the help menu, in load order
+        """
+        self._ensure()
+        return self._cogs
+
+    def page(self, cog):
+        """
+        (command listing, number of commands) for a cog
+        """
+        self._ensure()
+        return self._pages[cog]
+
+    def syntax(self, command):
+        self._ensure()
+        try:
+            return self._syntax[command.qualified_name]
+
+        except KeyError:  # added since the last build
+            return command_syntax(command)
+
+    def subcommands(self, command):
+        self._ensure()
+        return self._subcommands.get(command.qualified_name, [])
@@ -0,0 +1,167 @@
+"""
+URL and Discord invite detection.
+
+Instead of one big regex (which can backtrack for ages on the right input), a message is split
+on whitespace and every word is looked at a fixed number of times, so the time taken only
+ever grows linearly with the length of the message.
+
+Run this file directly for a benchmark on some nasty inputs.
+"""
+from collections import namedtuple
+
+__all__ = ('Link', 'Invite', 'find_links', 'find_invites', 'has_link', 'has_invite')
+
+Link = namedtuple('Link', 'url scheme host path')
+Invite = namedtuple('Invite', 'code host url')
+
+# stuff people wrap links in, <https://...> to hide embeds, (https://...) in sentences etc.
+WRAPPERS = '<>()[]{}"\'`*_|~'
+TRAILING = '.,:;!?' + WRAPPERS
+INVITE_HOSTS = {'discord.gg': '', 'discord.com': 'invite/', 'discordapp.com': 'invite/'}
+HOST_CHARS = frozenset('abcdefghijklmnopqrstuvwxyz0123456789-.')
+CODE_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-')
+
+
+def _is_ipv4(host):
+    parts = host.split('.')
+    return len(parts) == 4 and all(part.isdigit() and len(part) <= 3 and int(part) <= 255 for part in parts)
+
+
+def _valid_host(host, scheme=None):
+    if not host or not HOST_CHARS.issuperset(host):
+        return False
+
+    # bare IPs and localhost only count with a scheme in front, `1.2.3.4` on its own is probably a version
+    if scheme is not None and (host == 'localhost' or _is_ipv4(host)):
+        return True
+
+    labels = host.split('.')
+    if len(labels) < 2 or not all(labels):
+        return False
+
+    tld = labels[-1]
+    return 2 <= len(tld) <= 24 and tld.isalpha()
+
+
+def _parse(word):
+    """
+    Turn a single word into a Link, or None if it isn't one
+    """
+    word = word.strip(WRAPPERS).rstrip(TRAILING)
+    if not word:
+        return None
+
+    scheme, sep, rest = word.partition('://')
+    if sep:
+        # only the tail of the scheme counts, `see:https://...` is still a link
+        start = max(scheme.rfind(c) for c in WRAPPERS + ':') + 1
+        scheme, word = scheme[start:].lower(), word[start:]
+        if scheme not in ('http', 'https'):
+            return None
+
+    else:
+        scheme, rest = None, word
+
+    end = len(rest)
+    for i, char in enumerate(rest):
+        if char in '/?#':
+            end = i
+            break
+
+    authority, path = rest[:end], rest[end:]
+    host = authority.rpartition('@')[2].partition(':')[0].lower()
+
+    if not _valid_host(host, scheme):
+        return None
+
+    # without a scheme only count things that obviously look like links,
+    # otherwise every `e.g.` and `file.txt` would be one
+    if scheme is None and not host.startswith('www.') and not path.startswith('/'):
+        return None
+
+    return Link(word, scheme, host, path)
+
+
+def find_links(text):
+    """
+    Every link in a string, in order
+    """
+    links = []
+    for word in text.split():
+        link = _parse(word)
+        if link is not None:
+            links.append(link)
+
+    return links
+
+
+def _invite(link):
+    host = link.host[4:] if link.host.startswith('www.') else link.host
+    prefix = INVITE_HOSTS.get(host)
+    if prefix is None:
+        return None
+
+    path = link.path[1:]
+    if not path.startswith(prefix):
+        return None
+
+    code = path[len(prefix):].split('/', 1)[0].split('?', 1)[0].split('#', 1)[0]
+    if not 2 <= len(code) <= 32 or not CODE_CHARS.issuperset(code):
+        return None
+
+    return Invite(code, host, link.url)
+
+
+def find_invites(text):
+    """
+    Every Discord invite in a string, in order
+    """
+    invites = []
+    for link in find_links(text):
+        invite = _invite(link)
+        if invite is not None:
+            invites.append(invite)
+
+    return invites
+
+
+def has_link(text):
+    return any(_parse(word) is not None for word in text.split())
+
+
+def has_invite(text):
+    if 'disc' not in text.lower():  # nearly every message, so skip the work
+        return False
+
+    return any(_invite(link) is not None for link in find_links(text))
+
+
+if __name__ == '__main__':
+    import re
+    import timeit
+
+    # what we used to use, for comparison
+    url_regex = re.compile(
+        r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|(\([^\s("
+        r")<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))")
+    cases = {
+        'brackets': lambda n: 'http://' + '(' * n,
+        'nested': lambda n: 'www.a' + '(a' * n + ')',
+        'no spaces': lambda n: 'a.' * n + 'com',
+        'many links': lambda n: 'https://discord.gg/abc ' * (n // 20),
+    }
+
+    print(f"{'case':<12}{'length':>8}{'scanner':>14}{'old regex':>14}")
+    for name, make in cases.items():
+        for n in (250, 500, 1000, 2000, 4000):
+            text = make(n)
+            scanner = min(timeit.repeat(lambda: has_link(text), number=10, repeat=3)) / 10
+            # the old regex gets stupidly slow on some of these, so don't wait on it for the big ones
+            if n <= 2000:
+                regex = timeit.timeit(lambda: url_regex.search(text), number=1)
+                regex = f'{regex * 1000:.3f}ms'
+
+            else:
+                regex = 'skipped'
+
+            print(f"{name:<12}{len(text):>8}{scanner * 1000:>12.3f}ms{regex:>14}")
@@ -0,0 +1,90 @@
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+__all__ = ('SampleFilter', 'setup_logging')
+
+FORMAT = "%(asctime)s | %(levelname)s | %(module)s | %(message)s"
+DEFAULT_LEVELS = {'root': 'WARNING', 'discord': 'DEBUG'}
+# the gateway and http loggers say something about every single event/request
+DEFAULT_SAMPLES = {'discord.gateway': 50, 'discord.http': 10}
+
+
+class SampleFilter(logging.Filter):
+    """
+    Only keeps 1 in every `rate` records at or below `level` from noisy loggers.
+
+    `rates` maps logger names to rates, children count towards their parent's
+    rate unless they have one of their own.
+    """
+
+    def __init__(self, rates, level=logging.DEBUG):
+        super().__init__()
+        self.rates = {name: rate for name, rate in rates.items() if rate and rate > 1}
+        self.level = level
+        self._counts = dict.fromkeys(self.rates, 0)
+        self._names = {}  # logger name -> configured name it falls under, or None
+
+    def _category(self, name):
+        try:
+            return self._names[name]
+
+        except KeyError:
+            category, parts = None, name.split('.')
+            for i in range(len(parts), 0, -1):
+                if '.'.join(parts[:i]) in self.rates:
+                    category = '.'.join(parts[:i])
+                    break
+
+            self._names[name] = category
+            return category
+
+    def filter(self, record):
+        if record.levelno > self.level:
+            return True
+
+        category = self._category(record.name)
+        if category is None:
+            return True
+
+        self._counts[category] += 1
+        return self._counts[category] % self.rates[category] == 1
+
+
+def setup_logging(config=None):
+    """
+    Send every log record through a queue to a background thread that does the actual writing.
+
+    Reads the `logging` section of config.json: `file`, `max_bytes`/`backups` for size based
+    rotation or `when`/`backups` for time based rotation, `levels` for per logger levels
+    and `sample` for how many debug records to skip per kept one. Returns the started
+    listener, stop it on shutdown to flush whatever is still queued.
+    """
+    config = config or {}
+    filename = config.get('file', 'saturn.log')
+    backups = config.get('backups', 5)
+
+    if config.get('when'):
+        handler = TimedRotatingFileHandler(filename, when=config['when'], backupCount=backups,
+                                           encoding='utf-8')
+
+    else:
+        handler = RotatingFileHandler(filename, maxBytes=config.get('max_bytes', 10 * 1024 * 1024),
+                                      backupCount=backups, encoding='utf-8')
+
+    handler.setFormatter(logging.Formatter(FORMAT))
+
+    records = queue.SimpleQueue()
+    # QueueHandler formats the message (and any traceback) before queueing, so the record
+    # can't change under the writer thread when a logged object is mutated afterwards
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(SampleFilter({**DEFAULT_SAMPLES, **config.get('sample', {})}))
+
+    for name, level in {**DEFAULT_LEVELS, **config.get('levels', {})}.items():
+        logging.getLogger(None if name == 'root' else name).setLevel(level.upper())
+
+    logging.getLogger().addHandler(queue_handler)
+
+    listener = QueueListener(records, handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,215 @@
+"""
+A tiny Prometheus style metrics registry, and the bits that feed it.
+
+Metrics can be updated from any thread (pymongo's monitoring callbacks run on Motor's
+worker threads), and are served in the Prometheus text format from a local HTTP endpoint.
+"""
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+from aiohttp import web
+
+__all__ = ('Registry', 'MetricsServer', 'instrument_listener', 'measure_loop_lag')
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+
+    pairs = ','.join('{}="{}"'.format(name, str(value).replace('\\', r'\\').replace('"', r'\"'))
+                     for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in values]
+
+
+class Gauge(_Metric):
+    """
+    Either set directly, or give it a function returning {label values: value} that's called on scrape
+    """
+    kind = 'gauge'
+
+    def __init__(self, name, description, labels=(), function=None):
+        super().__init__(name, description, labels)
+        self.function = function
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        if self.function is not None:
+            try:
+                values = list(self.function().items())
+
+            except Exception:
+                log.exception("Collecting %s failed", self.name)
+                values = []
+
+        else:
+            with self._lock:
+                values = list(self._values.items())
+
+        return self.header() + [f"{self.name}{_labels(self.labels, k)} {v}" for k, v in values]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            values = [(k, (list(counts), total, count)) for k, (counts, total, count) in self._values.items()]
+
+        lines = self.header()
+        names = self.labels + ('le',)
+        for key, (counts, total, count) in values:
+            cumulative = 0
+            for bound, amount in zip(self.buckets + ('+Inf',), counts):
+                cumulative += amount
+                lines.append(f"{self.name}_bucket{_labels(names, key + (bound,))} {cumulative}")
+
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {count}")
+
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def _add(self, metric):
+        # asking for the same metric twice (a cog reload, say) hands back the existing one
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, description, labels=()):
+        return self._add(Counter(name, description, labels))
+
+    def gauge(self, name, description, labels=(), function=None):
+        gauge = self._add(Gauge(name, description, labels, function))
+        if function is not None:
+            gauge.function = function
+
+        return gauge
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, description, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_listener(registry, func):
+    """
+    Wrap an event listener so every call is timed, labelled with its qualified name
+    """
+    timings = registry.histogram('saturn_listener_seconds', 'Time spent in event listeners', ('listener',))
+    errors = registry.counter('saturn_listener_errors_total', 'Event listeners that raised', ('listener',))
+    name = getattr(func, '__qualname__', getattr(func, '__name__', repr(func)))
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+
+        except Exception:
+            errors.inc(name)
+            raise
+
+        finally:
+            timings.observe(time.perf_counter() - start, name)
+
+    return wrapper
+
+
+async def measure_loop_lag(registry, interval=1.0):
+    """
+    Sleep for `interval` over and over, and record how late every wakeup was
+    """
+    lag = registry.histogram('saturn_event_loop_lag_seconds', 'How late the event loop wakes up',
+                             buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 5))
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+class MetricsServer:
+    """
+    Serves the registry on http://host:port/metrics
+    """
+
+    def __init__(self, registry, host='127.0.0.1', port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner = None
+
+    async def _metrics(self, request):
+        return web.Response(text=self.registry.render(), content_type='text/plain', charset='utf-8')
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get('/metrics', self._metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info("Serving metrics on http://%s:%s/metrics", self.host, self.port)
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
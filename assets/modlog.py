@@ -0,0 +1,89 @@
+import asyncio
+import logging
+
+from pymongo.errors import BulkWriteError, PyMongoError
+
+__all__ = ('ModLogBuffer',)
+
+log = logging.getLogger(__name__)
+
+
+class ModLogBuffer:
+    """
+    Write-behind buffer for mod log documents.
+
+    Cases are queued with `add` and written in batches with insert_many, at most `interval`
+    seconds after they're queued (sooner if `max_batch` pile up). Anything that fails to write
+    stays queued and is retried on the next flush. Readers that need to see every case call
+    `flush` first, and `close` writes out whatever's left on shutdown.
+    """
+
+    def __init__(self, collection, interval=1.0, max_batch=100):
+        self.collection = collection
+        self.interval = interval
+        self.max_batch = max_batch
+        self._queue = []
+        self._lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def add(self, document):
+        self._queue.append(document)
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+        if len(self._queue) >= self.max_batch:
+            self._wakeup.set()
+
+    async def _run(self):
+        while self._queue:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+
+            except asyncio.TimeoutError:
+                pass
+
+            self._wakeup.clear()
+            if not await self.flush():
+                await asyncio.sleep(self.interval * 5)  # the database is struggling, back off a bit
+
+    async def flush(self):
+        """
+        Write everything queued so far. Returns whether it all made it.
+        """
+        async with self._lock:
+            while self._queue:
+                batch, self._queue[:self.max_batch] = self._queue[:self.max_batch], []
+                try:
+                    await self.collection.insert_many(batch, ordered=False)
+
+                except BulkWriteError as e:
+                    # duplicates mean the insert already went through on an earlier attempt
+                    failed = {error["index"] for error in e.details.get("writeErrors", [])
+                              if error.get("code") != 11000}
+                    if e.details.get("writeConcernErrors"):
+                        failed = set(range(len(batch)))
+
+                    if failed:
+                        log.warning("Writing %s mod logs failed, will retry", len(failed))
+                        self._queue[:0] = [document for n, document in enumerate(batch) if n in failed]
+                        return False
+
+                except PyMongoError:
+                    log.exception("Writing %s mod logs failed, will retry", len(batch))
+                    self._queue[:0] = batch
+                    return False
+
+        return True
+
+    async def close(self):
+        # flushing waits for any write already in flight, so nothing is cut off half way
+        if not await self.flush():
+            log.error("Shutting down with %s mod logs unwritten: %r", len(self._queue), self._queue)
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
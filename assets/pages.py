@@ -0,0 +1,89 @@
+import asyncio
+
+from discord.ext import menus
+from pymongo import ASCENDING, DESCENDING
+
+__all__ = ('MongoPageSource',)
+
+
+class MongoPageSource(menus.PageSource):
+    """
+    A menu page source that reads pages straight out of a collection as they're needed.
+
+    Pages are fetched with range queries on `key` (which should be the last field of an index
+    starting with the filter's fields), using the edge of an already fetched neighbouring page, so
+    flicking through pages never skips over documents. The pages either side of the one being
+    shown are fetched in the background, and only the last `keep` pages are held on to.
+    """
+
+    def __init__(self, collection, query, key, per_page=10, keep=5, projection=None):
+        self.collection = collection
+        self.query = query
+        self.key = key
+        self.projection = projection
+        self.per_page = per_page
+        self.keep = keep
+        self.total = 0
+        self._pages = {}  # page number -> task fetching it
+
+    async def prepare(self):
+        self.total = await self.collection.count_documents(self.query)
+
+    def is_paginating(self):
+        return self.total > self.per_page
+
+    def get_max_pages(self):
+        return max(1, -(-self.total // self.per_page))
+
+    def _done(self, number):
+        task = self._pages.get(number)
+        if task is not None and task.done() and not task.cancelled() and task.exception() is None:
+            return task.result()
+
+        return None
+
+    async def _fetch(self, number):
+        before, after = self._done(number - 1), self._done(number + 1)
+        find = self.collection.find
+        if number == 0:
+            cursor = find(self.query, self.projection).sort(self.key, ASCENDING)
+
+        elif before:
+            cursor = find({**self.query, self.key: {'$gt': before[-1][self.key]}}, self.projection) \
+                .sort(self.key, ASCENDING)
+
+        elif after:
+            cursor = find({**self.query, self.key: {'$lt': after[0][self.key]}}, self.projection) \
+                .sort(self.key, DESCENDING)
+            return list(reversed(await cursor.to_list(length=self.per_page)))
+
+        elif number == self.get_max_pages() - 1:
+            # jumping to the end, read it backwards
+            remainder = self.total - number * self.per_page
+            cursor = find(self.query, self.projection).sort(self.key, DESCENDING).limit(remainder)
+            return list(reversed(await cursor.to_list(length=remainder)))
+
+        else:
+            cursor = find(self.query, self.projection).sort(self.key, ASCENDING).skip(number * self.per_page)
+
+        return await cursor.to_list(length=self.per_page)
+
+    def _load(self, number):
+        task = self._pages.get(number)
+        if task is None or (task.done() and (task.cancelled() or task.exception() is not None)):
+            task = self._pages[number] = asyncio.ensure_future(self._fetch(number))
+
+        return task
+
+    async def get_page(self, page_number):
+        page = await self._load(page_number)
+
+        for number in (page_number - 1, page_number + 1):
+            if 0 <= number < self.get_max_pages():
+                self._load(number)
+
+        # forget pages that are well out of the way
+        for number in sorted(self._pages, key=lambda n: abs(n - page_number))[self.keep:]:
+            del self._pages[number]
+
+        return page
@@ -0,0 +1,121 @@
+import logging
+import time
+from functools import cached_property
+
+from .censor import normalize_words
+
+__all__ = ('MessageContext', 'MessagePipeline')
+
+log = logging.getLogger(__name__)
+
+
+class MessageContext:
+    """
+    Everything the message stages want to know about a message, worked out once.
+
+    `config` is the guild's config document (None in DMs or for unconfigured guilds),
+    `prefixes` is what the bot answers to there, and once the prefix stage has run, `prefix`
+    and `invoked` are the prefix the message starts with and the word after it.
+    A stage calls `stop` to keep the rest from running.
+    """
+
+    def __init__(self, bot, message, config):
+        self.bot = bot
+        self.message = message
+        self.guild = message.guild
+        self.author = message.author
+        self.config = config
+        self.content = message.content
+        self.prefixes = []
+        self.prefix = None
+        self.invoked = None
+        self.stopped = False
+
+    @cached_property
+    def words(self):
+        """
+        The content normalized for the word filter
+        """
+        return normalize_words(self.content)
+
+    @cached_property
+    def mentions_only_bot(self):
+        return self.content.strip() in (f'<@{self.bot.user.id}>', f'<@!{self.bot.user.id}>')
+
+    @property
+    def is_command(self):
+        return self.invoked is not None and self.bot.get_command(self.invoked) is not None
+
+    def stop(self):
+        self.stopped = True
+
+
+class MessagePipeline:
+    """
+    Runs every message through a list of stages, in order, sharing one MessageContext.
+
+    This replaces having a separate on_message listener per cog: the config lookup and
+    content processing happen once, a stage can stop the rest (automod deleting a message
+    means it's not run as a command), and everything runs in one task per message.
+    Stages are `async def stage(ctx)`, lower `order` runs first. A stage that raises is logged
+    and skipped over, the same as a listener raising used to be.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._stages = []  # (order, name, func), kept sorted
+        self._contexts = {}  # message id -> context, while the message is being processed
+        self._timings = bot.metrics.histogram(
+            'saturn_message_stage_seconds', 'Time spent in each message stage', ('stage',))
+
+    @property
+    def stages(self):
+        return [name for order, name, func in self._stages]
+
+    def add_stage(self, name, func, order):
+        self.remove_stage(name)
+        self._stages.append((order, name, func))
+        self._stages.sort(key=lambda stage: stage[0])
+
+    def remove_stage(self, name):
+        self._stages = [stage for stage in self._stages if stage[1] != name]
+
+    def context_for(self, message):
+        """
+        The context of a message that's currently going through the pipeline, if any
+        """
+        return self._contexts.get(message.id)
+
+    async def process(self, message):
+        if message.author.bot:
+            return None
+
+        config = None
+        if message.guild:
+            try:
+                config = await self.bot.config_cache.get(message.guild.id)
+
+            except Exception:
+                log.exception("Couldn't get the config for guild %s", message.guild.id)
+
+        ctx = self._contexts[message.id] = MessageContext(self.bot, message, config)
+        try:
+            for order, name, func in list(self._stages):
+                start = time.perf_counter()
+                try:
+                    await func(ctx)
+
+                except Exception:
+                    # one broken stage shouldn't take commands down with it
+                    log.exception("Message stage %s failed on message %s", name, message.id)
+
+                finally:
+                    self._timings.observe(time.perf_counter() - start, name)
+
+                if ctx.stopped:
+                    break
+
+        finally:
+            self._contexts.pop(message.id, None)
+
+        return ctx
@@ -0,0 +1,320 @@
+import asyncio
+import multiprocessing
+import re
+from datetime import datetime as dt, timedelta
+
+import discord
+import pytimeparse as pytp
+
+from .errors import InvalidPurgeFilter
+from .links import has_link, has_invite
+
+__all__ = ('PurgeFilter',)
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|((?:[^\s()"]|"[^"]*")+))')
+PATTERN_KEY = re.compile(r'\s*(-?(?:regex|re):)', re.IGNORECASE)
+MENTION = re.compile(r'<@!?(\d+)>|(\d{15,21})$')
+MAX_PATTERN = 100
+REGEX_TIMEOUT = 0.5  # seconds a regex gets per message before the purge is called off
+FLAGS = {
+    'bot': lambda m, content: m.author.bot,
+    'bots': lambda m, content: m.author.bot,
+    'human': lambda m, content: not m.author.bot,
+    'humans': lambda m, content: not m.author.bot,
+    'link': lambda m, content: has_link(content),
+    'links': lambda m, content: has_link(content),
+    'invite': lambda m, content: has_invite(m.content),
+    'invites': lambda m, content: has_invite(m.content),
+    'attachment': lambda m, content: bool(m.attachments),
+    'attachments': lambda m, content: bool(m.attachments),
+    'embed': lambda m, content: bool(m.embeds),
+    'embeds': lambda m, content: bool(m.embeds),
+    'mention': lambda m, content: bool(m.mentions or m.role_mentions or m.mention_everyone),
+    'mentions': lambda m, content: bool(m.mentions or m.role_mentions or m.mention_everyone),
+}
+
+
+def _tokenize(expression):
+    tokens, pos = [], 0
+    expression = expression.strip()
+    while pos < len(expression):
+        # regexes have brackets of their own, so an unquoted one is read up to where it ends
+        match = PATTERN_KEY.match(expression, pos)
+        if match and not expression.startswith('"', match.end()):
+            end = _pattern_end(expression, match.end())
+            tokens.append(expression[match.start(1):end])
+            pos = end
+            continue
+
+        match = TOKEN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise InvalidPurgeFilter(f"Unclosed quote in `{expression[pos:].strip()}`")
+
+        tokens.append(match.group(1) or match.group(2) or match.group(3))
+        pos = match.end()
+
+    return tokens
+
+
+def _pattern_end(expression, pos):
+    """
+    Where an unquoted regex starting at `pos` ends: the first space or `)` outside of its own groups
+    """
+    depth, in_class = 0, False
+    while pos < len(expression):
+        char = expression[pos]
+        if char == '\\':
+            pos += 2
+            continue
+
+        if in_class:
+            in_class = char != ']'
+
+        elif char == '[':
+            in_class = True
+
+        elif char == '(':
+            depth += 1
+
+        elif char == ')':
+            if not depth:
+                break
+
+            depth -= 1
+
+        elif char.isspace() and not depth:
+            break
+
+        pos += 1
+
+    return min(pos, len(expression))
+
+
+def _unquote(value):
+    # just the surrounding pair, quotes inside (`"don't"`) are part of the text
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+
+    return value
+
+
+def _time(key, value):
+    """
+    A message ID, or how long ago (`2h`, `1d12h`)
+    """
+    if value.isdigit() and len(value) >= 15:
+        return discord.utils.snowflake_time(int(value))
+
+    seconds = pytp.parse(value)
+    if seconds is None:
+        raise InvalidPurgeFilter(f"`{key}:` needs a message ID or a time like `2h`, not `{value}`")
+
+    return dt.utcnow() - timedelta(seconds=seconds)
+
+
+class _RegexRunner:
+    """
+    Runs regex searches in a separate process.
+
+    Python's regexes can backtrack for ages on the wrong pattern and input (`(a|a)+$`), and
+    they hold the GIL while they do, so they can't run on the event loop or in a thread.
+    A search that takes longer than `timeout` has its process killed (a new one is started
+    for the next search) and raises InvalidPurgeFilter.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self._pool = None
+        self._lock = None
+
+    async def search(self, pattern, text):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        # one at a time, so a search isn't timed while it waits behind someone else's
+        async with self._lock:
+            if self._pool is None:
+                self._pool = multiprocessing.get_context('spawn').Pool(1)
+
+            # subn, since match objects can't be sent back from the other process
+            result = self._pool.apply_async(re.subn, (pattern, '', text), {'count': 1, 'flags': re.IGNORECASE})
+            try:
+                _, found = await asyncio.get_running_loop().run_in_executor(None, result.get, self.timeout)
+
+            except multiprocessing.TimeoutError:
+                self._pool.terminate()
+                self._pool = None
+                raise InvalidPurgeFilter(f"`regex:{pattern}` took too long on a message, try a simpler regex")
+
+        return bool(found)
+
+
+_regexes = _RegexRunner(REGEX_TIMEOUT)
+
+
+class PurgeFilter:
+    """
+    A purge filter expression, compiled down to a single predicate.
+
+    Terms are ANDed together unless separated by `or`, can be negated with `not` or `-`,
+    and grouped with brackets, e.g. `from:@someone (link or invite) -contains:"hello there"`.
+    Content is lowercased once per message no matter how many terms look at it, and each
+    `regex:` is searched for once per message, out of process (see _RegexRunner), which is why
+    calling the filter gives back a coroutine.
+    Top level `before:`/`after:` terms are also exposed so the history scan can stop early.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.before = None
+        self.after = None
+        self._tokens = _tokenize(expression)
+        self._pos = 0
+        self._patterns = []
+        self._found = {}  # pattern -> whether it's in the message being checked
+        if not self._tokens:
+            raise InvalidPurgeFilter("The filter is empty")
+
+        self._predicate = self._parse_or(top=True)
+        if self._pos != len(self._tokens):
+            raise InvalidPurgeFilter(f"Unexpected `{self._tokens[self._pos]}`")
+
+    async def __call__(self, message):
+        self._found = {pattern: await _regexes.search(pattern, message.content) for pattern in self._patterns}
+        return self._predicate(message, message.content.lower())
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self._pos += 1
+        return token
+
+    def _parse_or(self, top=False):
+        terms = [self._parse_and(top)]
+        while self._peek() is not None and self._peek().lower() == 'or':
+            self._next()
+            terms.append(self._parse_and(False))
+
+        if len(terms) == 1:
+            return terms[0]
+
+        if top:  # the bounds only hold if every message has to match them
+            self.before = self.after = None
+
+        return lambda m, content: any(term(m, content) for term in terms)
+
+    def _parse_and(self, top):
+        terms = []
+        while self._peek() not in (None, ')') and self._peek().lower() != 'or':
+            if self._peek().lower() == 'and':
+                self._next()
+                continue
+
+            terms.append(self._parse_unary(top))
+
+        if not terms:
+            raise InvalidPurgeFilter("Expected a filter term")
+
+        if len(terms) == 1:
+            return terms[0]
+
+        return lambda m, content: all(term(m, content) for term in terms)
+
+    def _parse_unary(self, top):
+        token = self._peek()
+        if token.lower() == 'not':
+            self._next()
+            term = self._parse_unary(False)
+            return lambda m, content: not term(m, content)
+
+        if token.startswith('-') and len(token) > 1:
+            self._tokens[self._pos] = token[1:]
+            term = self._parse_unary(False)
+            return lambda m, content: not term(m, content)
+
+        if token == '(':
+            self._next()
+            term = self._parse_or()
+            if self._next() != ')':
+                raise InvalidPurgeFilter("Missing a closing bracket")
+
+            return term
+
+        if token == ')':
+            raise InvalidPurgeFilter("Unexpected `)`")
+
+        self._next()
+        return self._term(token, top)
+
+    def _term(self, token, top):
+        key, sep, value = token.partition(':')
+        key = key.lower()
+        if not sep:
+            try:
+                return FLAGS[key]
+
+            except KeyError:
+                raise InvalidPurgeFilter(f"Unknown filter `{token}`")
+
+        value = _unquote(value)
+        if not value:
+            raise InvalidPurgeFilter(f"`{key}:` needs a value, in quotes if it has spaces")
+
+        if key == 'has':
+            try:
+                return FLAGS[value.lower()]
+
+            except KeyError:
+                raise InvalidPurgeFilter(f"Unknown filter `has:{value}`")
+
+        if key in ('from', 'author', 'user'):
+            match = MENTION.match(value)
+            if not match:
+                raise InvalidPurgeFilter(f"`{key}:` needs a mention or a user ID")
+
+            user_id = int(match.group(1) or match.group(2))
+            return lambda m, content: m.author.id == user_id
+
+        if key in ('contains', 'match'):
+            text = value.lower()
+            return lambda m, content: text in content
+
+        if key in ('starts', 'startswith'):
+            text = value.lower()
+            return lambda m, content: content.startswith(text)
+
+        if key in ('ends', 'endswith'):
+            text = value.lower()
+            return lambda m, content: content.endswith(text)
+
+        if key in ('regex', 're'):
+            if len(value) > MAX_PATTERN:
+                raise InvalidPurgeFilter(f"Regexes can't be longer than {MAX_PATTERN} characters")
+
+            try:
+                re.compile(value, re.IGNORECASE)
+
+            except re.error as e:
+                raise InvalidPurgeFilter(f"Invalid regex: {e}")
+
+            self._patterns.append(value)
+            return lambda m, content: self._found[value]
+
+        if key == 'before':
+            when = _time(key, value)
+            if top:
+                self.before = min(self.before or when, when)
+
+            return lambda m, content: m.created_at < when
+
+        if key == 'after':
+            when = _time(key, value)
+            if top:
+                self.after = max(self.after or when, when)
+
+            return lambda m, content: m.created_at > when
+
+        raise InvalidPurgeFilter(f"Unknown filter `{key}:`")
+
@@ -0,0 +1,100 @@
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime as dt
+
+__all__ = ('ExpiryScheduler',)
+
+log = logging.getLogger(__name__)
+
+
+class ExpiryScheduler:
+    """
+    Runs a callback when a key's deadline passes.
+
+    Deadlines live in a min-heap, and the runner sleeps until the earliest one, so nothing
+    happens at all while there is nothing to expire. Scheduling and cancelling are O(log n),
+    cancelled or rescheduled entries are simply skipped when they reach the top of the heap.
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+        self._heap = []
+        self._deadlines = {}  # key -> (deadline, seq) of the live entry
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key):
+        return key in self._deadlines
+
+    def schedule(self, key, deadline: dt):
+        """
+        Schedule (or reschedule) a key to expire at a naive UTC datetime.
+        Deadlines that have already passed (mutes that ran out while the bot was down) expire straight away.
+        """
+        if deadline <= dt.utcnow():
+            self._deadlines.pop(key, None)
+            asyncio.ensure_future(self._expire(key))
+            return
+
+        entry = (deadline, next(self._counter))
+        self._deadlines[key] = entry
+        heapq.heappush(self._heap, (*entry, key))
+
+        if self._heap[0][2] == key:  # new earliest deadline, the runner has to wake up early
+            self._wakeup.set()
+
+    def cancel(self, key):
+        self._deadlines.pop(key, None)
+
+    def clear(self):
+        self._heap.clear()
+        self._deadlines.clear()
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            # throw away anything that was cancelled or rescheduled since it was pushed
+            while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][:2]:
+                heapq.heappop(self._heap)
+
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            deadline, _, key = self._heap[0]
+            delay = (deadline - dt.utcnow()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+
+                except asyncio.TimeoutError:
+                    pass
+
+                continue
+
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            asyncio.ensure_future(self._expire(key))
+
+    async def _expire(self, key):
+        try:
+            await self.callback(key)
+
+        except Exception:
+            log.exception("Expiry callback failed for %r", key)
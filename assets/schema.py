@@ -0,0 +1,154 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+__all__ = ('INDEXES', 'SchemaManager', 'migration')
+
+log = logging.getLogger(__name__)
+
+# every index the bot's queries need, per collection. _id lookups are covered by the default index
+INDEXES = {
+    'mod': [
+        IndexModel([("guild_id", ASCENDING), ("case_id", DESCENDING)]),  # cases, view_case, latest case ID
+        IndexModel([("guild_id", ASCENDING), ("member", ASCENDING), ("case_id", DESCENDING)]),  # member's cases
+    ],
+    'tags': [
+        IndexModel([("guild_id", ASCENDING), ("name", ASCENDING)], unique=True),
+    ],
+    'jobs': [
+        IndexModel([("guild_id", ASCENDING), ("job_id", ASCENDING)], unique=True),
+        IndexModel([("status", ASCENDING)]),
+    ],
+}
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """
+    Register a data migration. They run once each, in version order, before indexes are made.
+    """
+    def decorator(func):
+        MIGRATIONS.append((version, description, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+
+    return decorator
+
+
+@migration(1, "Seed the case ID counters from existing mod logs")
+async def _seed_case_counters(db):
+    async for group in db.mod.aggregate([{'$group': {"_id": "$guild_id", "case_id": {'$max': "$case_id"}}}]):
+        if group["_id"] is not None and group["case_id"] is not None:
+            await db.counters.update_one({"_id": group["_id"]}, {'$max': {"case_id": group["case_id"]}},
+                                         upsert=True)
+
+
+@migration(2, "Rename duplicate tags so (guild_id, name) can be unique")
+async def _dedupe_tags(db):
+    pipeline = [
+        {'$group': {"_id": {"guild_id": "$guild_id", "name": "$name"}, "ids": {'$push': "$_id"},
+                    "count": {'$sum': 1}}},
+        {'$match': {"count": {'$gt': 1}}},
+    ]
+    async for group in db.tags.aggregate(pipeline, allowDiskUse=True):
+        # the oldest one is the one people have been getting all along, the rest get a suffix
+        guild_id, name = group["_id"]["guild_id"], group["_id"]["name"]
+        n = 1
+        for _id in sorted(group["ids"])[1:]:
+            # skip over suffixes somebody already made a tag with
+            n += 1
+            while await db.tags.count_documents({"guild_id": guild_id, "name": f'{name}-{n}'}, limit=1):
+                n += 1
+
+            await db.tags.update_one({"_id": _id}, {'$set': {"name": f'{name}-{n}'}})
+
+
+class SchemaManager:
+    """
+    Brings the database up to date on startup.
+
+    Runs any migrations newer than the version stored in the `meta` collection, then makes
+    sure every index in INDEXES exists. Both are safe to run over and over.
+    """
+
+    def __init__(self, db, meta='meta'):
+        self.db = db
+        self.meta = db[meta]
+
+    async def version(self):
+        data = await self.meta.find_one({"_id": "schema"})
+        return data["version"] if data else 0
+
+    async def migrate(self):
+        """
+        Returns the versions that were applied
+        """
+        applied, current = [], await self.version()
+        for version, description, func in MIGRATIONS:
+            if version <= current:
+                continue
+
+            log.info("Running migration %s: %s", version, description)
+            await func(self.db)
+            await self.meta.update_one({"_id": "schema"}, {'$max': {"version": version}}, upsert=True)
+            applied.append(version)
+
+        return applied
+
+    async def ensure_indexes(self):
+        """
+        Returns the names of the indexes that had to be made
+        """
+        created = []
+        for collection, indexes in INDEXES.items():
+            existing = await self.db[collection].index_information()
+            for index in indexes:
+                if index.document["name"] in existing:
+                    continue
+
+                try:
+                    created.extend(await self.db[collection].create_indexes([index]))
+
+                except OperationFailure as e:
+                    log.warning("Could not create index %s on %s: %s", index.document["name"], collection, e)
+
+        return created
+
+    async def run(self):
+        try:
+            await self.migrate()
+            created = await self.ensure_indexes()
+
+        except Exception:
+            log.exception("Bringing the database schema up to date failed")
+            return
+
+        if created:
+            log.info("Created indexes: %s", ', '.join(created))
+
+    async def report(self):
+        """
+        Per collection, the declared indexes that don't exist and the existing ones nothing has used
+        (since the server last started). Returns {collection: (missing, unused)}.
+        """
+        report = {}
+        for collection in sorted(set(INDEXES) | set(await self.db.list_collection_names())):
+            declared = {index.document["name"] for index in INDEXES.get(collection, [])}
+            existing = await self.db[collection].index_information()
+            missing = sorted(declared - set(existing))
+
+            unused = []
+            try:
+                async for stats in self.db[collection].aggregate([{'$indexStats': {}}]):
+                    if stats["name"] != "_id_" and not stats["accesses"]["ops"]:
+                        unused.append(stats["name"])
+
+            except OperationFailure:  # not allowed on this deployment
+                pass
+
+            if missing or unused:
+                report[collection] = (missing, sorted(unused))
+
+        return report
@@ -0,0 +1,137 @@
+import logging
+import threading
+
+from pymongo import monitoring
+
+__all__ = ('SlowQueryMonitor', 'query_shape')
+
+log = logging.getLogger(__name__)
+
+# where each command keeps the filter it runs with
+FILTERS = {
+    'find': lambda c: c.get('filter'),
+    'count': lambda c: c.get('query'),
+    'distinct': lambda c: c.get('query'),
+    'findAndModify': lambda c: c.get('query'),
+    'delete': lambda c: (c.get('deletes') or [{}])[0].get('q'),
+    'update': lambda c: (c.get('updates') or [{}])[0].get('q'),
+    'aggregate': lambda c: next((stage['$match'] for stage in c.get('pipeline', []) if '$match' in stage), None),
+}
+IGNORED = {'isMaster', 'ismaster', 'hello', 'ping', 'endSessions', 'getMore', 'killCursors', 'saslStart',
+           'saslContinue', 'buildInfo'}
+
+
+def query_shape(value):
+    """
+    A filter with the values taken out, so `{"guild_id": 123}` and `{"guild_id": 456}` look the same
+    """
+    if isinstance(value, dict):
+        return '{' + ', '.join(f'{k}: {query_shape(v)}' for k, v in sorted(value.items())) + '}'
+
+    if isinstance(value, (list, tuple)):
+        # lists of values collapse into one, lists of sub-filters ($or, $and) keep their structure
+        if value and all(isinstance(v, dict) for v in value):
+            return '[' + ', '.join(query_shape(v) for v in value) + ']'
+
+        return '[?]'
+
+    return '?'
+
+
+class SlowQueryMonitor(monitoring.CommandListener):
+    """
+    Keeps per query shape timings for everything the bot asks Mongo, and logs anything slower
+    than `threshold` seconds along with its shape.
+
+    Given a metrics `registry`, it also times every command by collection and operation and
+    counts the failures, so each command is only picked apart once.
+
+    Shapes are grouped by collection and operation, up to `max_shapes` of them, anything
+    past that is lumped together so a runaway query generator can't eat memory.
+    pymongo calls these from its own threads, hence the lock.
+    """
+
+    def __init__(self, threshold=0.1, max_shapes=500, registry=None):
+        self.threshold = threshold
+        self.max_shapes = max_shapes
+        self.queries = self.failures = None
+        if registry is not None:
+            self.queries = registry.histogram(
+                'saturn_mongo_seconds', 'Time taken by MongoDB commands', ('collection', 'operation'))
+            self.failures = registry.counter(
+                'saturn_mongo_failures_total', 'MongoDB commands that failed', ('collection', 'operation'))
+
+        self._started = {}  # request id -> (collection, operation, shape)
+        self._stats = {}  # (collection, operation, shape) -> [count, total, slowest]
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ''
+
+        # housekeeping commands still go in the metrics, but have no shape worth keeping
+        shape = None
+        if event.command_name not in IGNORED:
+            try:
+                shape = query_shape(FILTERS[event.command_name](command) or {})
+
+            except KeyError:
+                shape = '-'
+
+        self._started[event.request_id] = (collection, event.command_name, shape)
+
+    def _finished(self, event, failed=False):
+        key = self._started.pop(event.request_id, None)
+        if key is None:
+            return
+
+        duration = event.duration_micros / 1e6
+        if self.queries is not None:
+            self.queries.observe(duration, key[0], key[1])
+            if failed:
+                self.failures.inc(key[0], key[1])
+
+        if key[2] is None:
+            return
+
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                if len(self._stats) >= self.max_shapes:
+                    key = (key[0], key[1], '(other)')
+
+                stats = self._stats.setdefault(key, [0, 0.0, 0.0])
+
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+        if duration >= self.threshold:
+            log.warning("Slow query (%.0fms) %s.%s %s", duration * 1000, key[0], key[1], key[2])
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def top(self, n=10, by='total'):
+        """
+        The `n` worst query shapes as (collection, operation, shape, count, total, slowest),
+        sorted by total time, slowest single run or average time
+        """
+        with self._lock:
+            rows = [(*key, *stats) for key, stats in self._stats.items()]
+
+        sort = {
+            'total': lambda row: row[4],
+            'max': lambda row: row[5],
+            'avg': lambda row: row[4] / row[3],
+        }[by]
+        return sorted(rows, key=sort, reverse=True)[:n]
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
@@ -0,0 +1,94 @@
+from collections import deque
+from datetime import datetime as dt, timedelta
+
+__all__ = ('Snipe', 'SnipeStore')
+
+
+class Snipe:
+    """
+    A deleted or edited message. `before` is only set for edits.
+    """
+    __slots__ = ('message_id', 'guild_id', 'channel_id', 'author_id', 'content', 'before', 'time')
+
+    def __init__(self, message, content, before=None):
+        self.message_id = message.id
+        self.guild_id = message.guild.id
+        self.channel_id = message.channel.id
+        self.author_id = message.author.id
+        self.content = content
+        self.before = before
+        self.time = dt.utcnow()
+
+
+class SnipeStore:
+    """
+    Recently deleted (or edited) messages.
+
+    Every snipe goes into three fixed size deques, one for its guild, one for its channel and
+    one for its author, so any lookup only ever looks at the newest few entries of one deque.
+    Expired entries are dropped as they're read, and `prune` sweeps the ones nobody reads.
+    """
+
+    def __init__(self, per_channel=50, per_author=10, per_guild=100, max_age=600):
+        self.max_age = timedelta(seconds=max_age)
+        self._guilds = {}
+        self._channels = {}
+        self._authors = {}
+        self._sizes = ((self._guilds, per_guild), (self._channels, per_channel), (self._authors, per_author))
+
+    def _keys(self, snipe):
+        return snipe.guild_id, (snipe.guild_id, snipe.channel_id), (snipe.guild_id, snipe.author_id)
+
+    def add(self, snipe):
+        for (index, size), key in zip(self._sizes, self._keys(snipe)):
+            try:
+                index[key].append(snipe)
+
+            except KeyError:
+                index[key] = deque((snipe,), maxlen=size)
+
+    def _expire(self, index, key, now):
+        snipes = index.get(key)
+        if snipes is None:
+            return None
+
+        while snipes and now - snipes[0].time >= self.max_age:
+            snipes.popleft()
+
+        if not snipes:
+            del index[key]
+            return None
+
+        return snipes
+
+    def latest(self, guild_id, channel_id=None, author_id=None):
+        """
+        Get the newest snipe in a guild, optionally only from a channel and/or author
+        """
+        now = dt.utcnow()
+        if channel_id is not None:
+            snipes = self._expire(self._channels, (guild_id, channel_id), now)
+
+        elif author_id is not None:
+            snipes = self._expire(self._authors, (guild_id, author_id), now)
+
+        else:
+            snipes = self._expire(self._guilds, guild_id, now)
+
+        if not snipes:
+            return None
+
+        if channel_id is None or author_id is None:
+            return snipes[-1]
+
+        for snipe in reversed(snipes):
+            if snipe.author_id == author_id:
+                return snipe
+
+        return None
+
+    def prune(self):
+        now = dt.utcnow()
+        for index, _ in self._sizes:
+            for key in list(index):
+                self._expire(index, key, now)
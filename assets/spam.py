@@ -0,0 +1,70 @@
+import time
+from collections import deque
+
+__all__ = ('SpamDetector',)
+
+
+class SpamDetector:
+    """
+    Sliding window message counter for the anti-spam system.
+
+    Only a timestamp and a content hash are kept per message, in a small deque per
+    (guild, author). Anything older than the window is dropped whenever the author sends
+    another message, and `sweep` forgets authors that have gone quiet.
+    """
+
+    def __init__(self, max_messages=50, idle=300):
+        self.max_messages = max_messages
+        self.idle = idle
+        self._windows = {}
+
+    def __len__(self):
+        return len(self._windows)
+
+    def record(self, message, window, threshold, repeats=None):
+        """
+        Record a message, then return whether its author is spamming.
+
+        That's more than `threshold` messages within `window` seconds, or more than `repeats`
+        copies of the same message within the window (by default half the threshold, but at
+        least 2), since the same thing over and over is spam even if it's a bit slower.
+        """
+        key = message.guild.id, message.author.id
+        # attachment and embed only messages have no content, they'd all look like the same message
+        now, digest = time.monotonic(), hash(message.content) if message.content else None
+
+        try:
+            messages = self._windows[key]
+
+        except KeyError:
+            messages = self._windows[key] = deque(maxlen=self.max_messages)
+
+        messages.append((now, digest))
+        while now - messages[0][0] > window:
+            messages.popleft()
+
+        if len(messages) > threshold:
+            return True
+
+        if digest is None:
+            return False
+
+        if repeats is None:
+            repeats = max(2, threshold // 2)
+
+        return sum(1 for _, _digest in messages if _digest == digest) > repeats
+
+    def count(self, guild_id, author_id):
+        try:
+            return len(self._windows[guild_id, author_id])
+
+        except KeyError:
+            return 0
+
+    def clear(self, guild_id, author_id):
+        self._windows.pop((guild_id, author_id), None)
+
+    def sweep(self):
+        deadline = time.monotonic() - self.idle
+        for key in [key for key, messages in self._windows.items() if messages[-1][0] < deadline]:
+            del self._windows[key]
@@ -1,15 +1,23 @@
 import asyncio
+import gzip
+import inspect
+import io
 from datetime import datetime as dt, timedelta
 
 # noinspection PyUnresolvedReferences
 import discord
 # noinspection PyUnresolvedReferences
 from discord.ext import commands
+from pymongo import ReturnDocument
 
 from saturn import default_prefix
+from .bulk import gather_limited
 from .constants import *
 from discord.ext import menus
 
+MUTE_OVERWRITE = {"read_messages": True, "send_messages": False}
+_overwrite_syncs = {}  # guild id -> running overwrite sync
+
 
 def flatten(l):
     _list = []
@@ -61,32 +69,13 @@ def convert_time(time):
         return 'indefinitely'
 
 
-async def syntax(command):
-    """
-    Get the syntax/usage for a command.
-    """
-    params = []
-
-    for key, value in command.params.items():
-        if key not in ("self", "ctx"):
-            value = str(value)
-            if "optional" in str(value).lower() or "greedy" in str(value).lower():
-                params.append(f"[{key}]")
-
-            else:
-                params.append(f"<{key}>")
-
-    params = " ".join(params)
-    return f"```{str(command.qualified_name)} {params}```"
-
-
 # noinspection PyBroadException
 async def retrieve_raw_prefix(bot, message):
     """
     A method for retrieving the raw prefix out of the database
     """
     try:
-        data = await bot.config.find_one({"_id": message.guild.id})
+        data = await bot.config_cache.get(message.guild.id)
 
         # make sure that we have a prefix in the data
         if not data or not data["prefix"]:
@@ -106,7 +95,13 @@ async def retrieve_prefix(bot, message):
     """
     Return the prefix as a readable string
     """
-    prefix = await retrieve_raw_prefix(bot, message)
+    return format_prefix(await retrieve_raw_prefix(bot, message))
+
+
+def format_prefix(prefix):
+    """
+    Make a raw prefix (a string or a list of them) readable
+    """
     if isinstance(prefix, str):
         return prefix
     elif isinstance(prefix, list):
@@ -114,47 +109,111 @@ async def retrieve_prefix(bot, message):
         return ' | '.join(prefix)
 
 
+class PurgeTranscript:
+    """
+    A transcript of purged messages, written into memory as they get deleted.
+    Switches to gzip once it gets bigger than `compress_after` bytes so it still fits in an upload.
+    """
+
+    def __init__(self, header, compress_after=1024 * 1024):
+        self.compress_after = compress_after
+        self.compressed = False
+        self._buffer = io.BytesIO()
+        self._stream = self._buffer
+        self._write(header)
+
+    def _write(self, text):
+        self._stream.write(text.encode('utf-8'))
+        if not self.compressed and self.compress_after is not None \
+                and self._buffer.tell() > self.compress_after:
+            raw = self._buffer.getvalue()
+            self._buffer = io.BytesIO()
+            self._stream = gzip.GzipFile(fileobj=self._buffer, mode='wb')
+            self._stream.write(raw)
+            self.compressed = True
+
+    def add(self, message):
+        content = message.clean_content
+        if not message.author.bot:
+            self._write(f"{message.author} at {str(message.created_at)[:-7]} UTC"
+                        f" (ID - {message.author.id})\n"
+                        f"{content} (Message ID - {message.id})\n\n")
+
+        else:
+            self._write(f"{message.author} at {str(message.created_at)[:-7]} UTC"
+                        f" (ID - {message.author.id})\n"
+                        f"{'Embed/file sent by a bot' if not content else content}\n\n")
+
+    def to_file(self, name):
+        if self.compressed:
+            self._stream.close()  # writes the gzip trailer, leaves the buffer open
+            name += '.gz'
+
+        self._buffer.seek(0)
+        return discord.File(self._buffer, filename=name)
+
+
 # noinspection PyUnusedLocal, SpellCheckingInspection
-async def purge_msgs(bot, ctx, limit, check):
+async def purge_msgs(bot, ctx, limit, check, before=None, after=None):
     await ctx.message.delete()
-    deleted = await ctx.channel.purge(
-        limit=limit,
-        after=dt.utcnow() - timedelta(weeks=2),
-        check=check)
+    data = await bot.config_cache.get(ctx.guild.id)
+    try:
+        mod_logs = ctx.guild.get_channel(data['mod_logs'])
 
-    if not len(deleted):
+    except (KeyError, TypeError):
+        mod_logs = None
+
+    transcript = None
+    if mod_logs:
+        transcript = PurgeTranscript(f"Messages deleted in the #{ctx.channel} channel by {ctx.author}"
+                                     f" (newest first):\n\n")
+
+    # same thing channel.purge does, but newest first, and the transcript is written as we go
+    deleted, chunk = [], []
+
+    async def flush():
+        await ctx.channel.delete_messages(chunk)
+        deleted.extend(chunk)
+        if transcript:
+            for m in chunk:
+                transcript.add(m)
+
+        chunk.clear()
+
+    # bulk deletes only work on messages from the last two weeks. Passing `after` to history would
+    # make it page forwards from the oldest message, so walk backwards and stop at the cutoff instead
+    after = max(after or dt.min, dt.utcnow() - timedelta(weeks=2))
+    async for message in ctx.channel.history(limit=limit, before=before, oldest_first=False):
+        if message.created_at <= after:
+            break
+
+        matched = check(message)
+        if inspect.isawaitable(matched):  # PurgeFilter checks are async
+            matched = await matched
+
+        if matched:
+            chunk.append(message)
+            if len(chunk) == 100:  # bulk deletes are capped at 100
+                await flush()
+
+    if chunk:
+        await flush()
+
+    if not deleted:
         em = discord.Embed(
             description=f"{ERROR} Could not find any messages to delete.\n"
                         f"```Messages older than 2 weeks cannot be deleted```",
             color=RED)
         return await ctx.send(embed=em)
 
-    deleted = list(reversed(deleted))
-
     em = discord.Embed(
         description=f"{CHECK} Deleted {len(deleted)} messages in {ctx.channel.mention}",
         color=GREEN)
     await ctx.send(embed=em, delete_after=2)
-    data = await bot.config.find_one({"_id": ctx.guild.id})
-    try:
-        mod_logs = ctx.guild.get_channel(data['mod_logs'])
-
-    except KeyError or TypeError:
-        return
 
     if not mod_logs:
         return
 
-    await create_purge_file(bot, ctx, deleted)
-
-    try:
-        file = discord.File(f'{bot.path}/assets/purge_txts/purge-{deleted[0].id}.txt')
-
-    except FileNotFoundError:
-        await create_purge_file(bot, ctx, deleted)
-
-    file = discord.File(f'{bot.path}/assets/purge-txts/purge-{deleted[0].id}.txt')
-
     em = discord.Embed(
         title='Messages Purged',
         description=f'Deleted {len(deleted)} messages in {ctx.channel.mention}\n'
@@ -164,50 +223,56 @@ async def purge_msgs(bot, ctx, limit, check):
     )
     em.set_thumbnail(url="https://emojipedia-us.s3.dualstack.us-west-1.amazonaws.com/"
                          "thumbs/120/mozilla/36/memo_1f4dd.png")
-    em.set_footer(text="Download the .txt file below to view deleted messages")
-    await mod_logs.send(embed=em)
-    await asyncio.sleep(0.5)
-    await mod_logs.send(file=file)
-
-
-async def create_purge_file(bot, ctx, deleted):
-    with open(f'{bot.path}/assets/purge-txts/purge-{deleted[0].id}.txt', 'w+', encoding='utf-8') as f:
-        f.write(f"{len(deleted)} messages deleted in the #{ctx.channel} channel by {ctx.author}:\n\n")
-        for message in deleted:
-            content = message.clean_content
-            if not message.author.bot:
-                f.write(f"{message.author} at {str(message.created_at)[:-7]} UTC"
-                        f" (ID - {message.author.id})\n"
-                        f"{content} (Message ID - {message.id})\n\n")
-
-            else:
-                f.write(f"{u'{}'.format(str(message.author))} at {str(message.created_at)[:-7]} UTC"
-                        f" (ID - {message.author.id})\n"
-                        f"{'Embed/file sent by a bot' if not content else content}\n\n")
+    em.set_footer(text="Download the file below to view deleted messages")
+    await mod_logs.send(embed=em, file=transcript.to_file(f'purge-{deleted[0].id}.txt'))
 
 
 async def create_mute_role(bot, ctx):
-    """Create the mute role for a guild"""
+    """
+    Create the mute role for a guild.
+    The channel overwrites are applied in the background, so the mute doesn't have to wait for them.
+    """
     perms = discord.Permissions(
         send_messages=False, read_messages=True)
     mute_role = await ctx.guild.create_role(
         name='Muted', permissions=perms,
         reason='Could not find a muted role in the process of muting or unmuting.')
 
-    await bot.config.update_one({"_id": ctx.guild.id},
-                                {'$set': {"mute_role": mute_role.id}}, upsert=True)
-
-    for channel in ctx.guild.channels:
-        try:
-            await channel.set_permissions(mute_role, read_messages=True, send_messages=False)
+    await bot.config_cache.update(ctx.guild.id,
+                                  {'$set': {"mute_role": mute_role.id}}, upsert=True)
 
-        except discord.Forbidden:
-            continue
+    sync_mute_overwrites(bot, ctx.guild, mute_role)
+    return mute_role
 
-        except discord.HTTPException:
-            continue
 
-    return mute_role
+def sync_mute_overwrites(bot, guild, mute_role):
+    """
+    Start applying the mute role's overwrite to every channel that doesn't have it yet.
+    Returns the task, or the one already running for the guild.
+    """
+    task = _overwrite_syncs.get(guild.id)
+    if task is None or task.done():
+        task = _overwrite_syncs[guild.id] = bot.loop.create_task(_sync_mute_overwrites(guild, mute_role))
+        task.add_done_callback(lambda _: _overwrite_syncs.pop(guild.id, None))
+
+    return task
+
+
+async def _sync_mute_overwrites(guild, mute_role):
+    async def apply(channel):
+        overwrite = channel.overwrites_for(mute_role)
+        overwrite.update(**MUTE_OVERWRITE)
+        await channel.set_permissions(mute_role, overwrite=overwrite,
+                                      reason='Setting up the mute role.')
+
+    # leave alone anything that already matches, and don't bother with channels we can't edit
+    channels = [
+        channel for channel in guild.channels
+        if channel.permissions_for(guild.me).manage_roles
+        and any(getattr(channel.overwrites_for(mute_role), k) != v for k, v in MUTE_OVERWRITE.items())
+    ]
+    # Forbidden/HTTPExceptions are counted as failures by gather_limited, same as before we just move on
+    return await gather_limited(channels, apply, limit=5)
 
 # TODO add yes/no confirmation box style things for commands making un-doable actions
 
@@ -240,83 +305,59 @@ class ConfirmationMenu(menus.Menu):
         await self.start(ctx, wait=True)
         return self.result
 
-class Dueler:
-    """
-    A dueler class. Used for the duel command
-    """
-
-    def __init__(self, member: discord.Member):
-        self.member = member
-        self.health = 100
+PUNISHMENT_STYLES = {
+    "kick": {"colour": discord.Colour.orange(), "emote": NO_ENTRY},
+    "ban": {"colour": discord.Colour.red(), "emote": NO_ENTRY},
+    "mute": {"colour": discord.Colour.orange(), "emote": MUTE},
+    "unmute": {"colour": discord.Colour.green(), "emote": UNMUTE},
+    "warn": {"colour": discord.Colour.gold(), "emote": WARN},
+    "unban": {"colour": discord.Colour.gold(), "emote": UNBAN},
+    "softban": {"colour": discord.Colour.red(), "emote": NO_ENTRY},
+    "tempban": {"colour": discord.Colour.red(), "emote": NO_ENTRY}
+}
 
-    def damage(self, amount):  # do damage
-        self.health -= amount
 
-    def heal(self, amount):  # heal hp
-        self.health += amount
+def _punishment_style(action):
+    style = PUNISHMENT_STYLES.get(str(action).lower())
+    return (style["colour"], style["emote"]) if style else (GOLD, None)
 
-    def health(self):
-        return self.health
 
-    @property
-    def name(self):
-        return self.member.name
-
-    def member(self):
-        return self.member
-
-
-# noinspection PyBroadException,SpellCheckingInspection
-async def create_log(bot, member, guild, action, moderator, reason, duration=None):
+async def notify_member(member, guild, action, moderator, reason, duration=None):
     """
-    Send details about a punishment and log it in the mod logs channel.
+    DM a member about their punishment. Members with DMs closed are skipped.
+    Punishments that remove the member (kicks and bans) have to do this before the action,
+    the bot can't DM anyone it doesn't share a guild with.
     """
-    colours = {
-        "kick": {"colour": discord.Colour.orange(), "emote": NO_ENTRY},
-        "ban": {"colour": discord.Colour.red(), "emote": NO_ENTRY},
-        "mute": {"colour": discord.Colour.orange(), "emote": MUTE},
-        "unmute": {"colour": discord.Colour.green(), "emote": UNMUTE},
-        "warn": {"colour": discord.Colour.gold(), "emote": WARN},
-        "unban": {"colour": discord.Colour.gold(), "emote": UNBAN},
-        "softban": {"colour": discord.Colour.red(), "emote": NO_ENTRY},
-        "tempban": {"colour": discord.Colour.red(), "emote": NO_ENTRY}
-    }
-    colour = GOLD
-    emote = None
-    for key, value in colours.items():
-        if str(key) == str(action.lower()):
-            colour, emote = value["colour"], value["emote"]
-
-    try:
-        em = discord.Embed(
-            colour=colour,
-            timestamp=dt.utcnow()
-        )
-        em.set_thumbnail(url=emote)
-        desc = f"**Guild** - {guild}\n" \
-               f"**Moderator** - {moderator.mention}\n" \
-               f"**Action** - {action.title()}\n" \
-               f"**Reason** - {reason}\n"
-        if duration:
-            desc += f"**Duration** - {duration}\n"
+    colour, emote = _punishment_style(action)
+    em = discord.Embed(
+        colour=colour,
+        timestamp=dt.utcnow()
+    )
+    em.set_thumbnail(url=emote)
+    desc = f"**Guild** - {guild}\n" \
+           f"**Moderator** - {moderator.mention}\n" \
+           f"**Action** - {action.title()}\n" \
+           f"**Reason** - {reason}\n"
+    if duration:
+        desc += f"**Duration** - {duration}\n"
 
-        em.description = desc
+    em.description = desc
 
+    try:
         await member.send(embed=em)
 
-    except discord.Forbidden:
+    except discord.HTTPException:  # DMs closed, most likely
         pass
 
-    except Exception as e:
-        raise e
 
-    # send it to the log channel because why not lol
-    data, mod_logs = await bot.config.find_one({"_id": guild.id}), None
-    try:
-        mod_logs = guild.get_channel(data['mod_logs'])
-
-    except KeyError or TypeError:
-        pass
+async def _send_mod_log(bot, member, guild, action, moderator, reason, duration, case_id):
+    """
+    Post a punishment in the guild's mod logs channel, if it has one
+    """
+    data = await bot.config_cache.get(guild.id)
+    mod_logs = guild.get_channel(data.get('mod_logs')) if data else None
+    if mod_logs is None:
+        return
 
     action_ = action
     if action.find("ban") != -1:
@@ -328,13 +369,14 @@ async def create_log(bot, member, guild, action, moderator, reason, duration=Non
     else:
         action_ += "ed"
 
+    colour, emote = _punishment_style(action)
     em = discord.Embed(
         title=f'Member {action_.title()}',
         colour=colour,
         timestamp=dt.utcnow()
     )
     em.set_thumbnail(url=emote)
-    em.set_footer(text='Case no. {}'.format(await get_last_case_id(bot, guild)))
+    em.set_footer(text='Case no. {}'.format(case_id))
     em.add_field(name='Member', value=member.mention, inline=False)
     em.add_field(name='Moderator', value=moderator.mention, inline=False)
     if duration:
@@ -346,64 +388,62 @@ async def create_log(bot, member, guild, action, moderator, reason, duration=Non
     try:
         await mod_logs.send(embed=em)
 
-    except AttributeError:
+    except discord.HTTPException:
         pass
 
-    _action = action + ((' lasting ' + duration) if duration else '')
-    # get the action + duration for formatting purposes
-
-    await _create_log(bot, member, guild, _action, moderator, reason)  # create the log
-
 
-async def get_member_mod_logs(bot, member, guild):
+# noinspection PyBroadException,SpellCheckingInspection
+async def create_log(bot, member, guild, action, moderator, reason, duration=None, notify=True):
     """
-    Fetch mod logs for a specific guild
-    Will only fetch the first 10000 punishments, because ya know, operation times suck
+    Record a punishment once it's been applied.
+    The case is queued for writing, then the member's DM and the mod logs post go out together.
+    Pass notify=False if the member was already told with `notify_member`.
     """
-    logs = []
-    cursor = bot.mod.find({"member": member.id, "guild_id": guild.id})
-    for document in await cursor.to_list(length=10000):
-        logs.append(document)
+    case_id = await next_case_id(bot, guild)
 
-    return logs
+    # get the action + duration for formatting purposes
+    _action = action + ((' lasting ' + duration) if duration else '')
+    _create_log(bot, member, guild, _action, moderator, reason, case_id)
 
+    sends = [_send_mod_log(bot, member, guild, action, moderator, reason, duration, case_id)]
+    if notify:
+        sends.append(notify_member(member, guild, action, moderator, reason, duration))
 
-async def get_guild_mod_logs(bot, guild):
-    """
-    Fetch mod logs for a specific guild
-    """
-    logs = []
-    cursor = bot.mod.find({"guild_id": guild.id})
-    for document in await cursor.to_list(length=10000):
-        logs.append(document)
+    await asyncio.gather(*sends)
+    return case_id
 
-    return logs
 
+async def _seed_case_counter(bot, guild):
+    """
+    Start a guild's case counter off at its highest existing case ID
+    """
+    last = await bot.mod.find_one({"guild_id": guild.id}, sort=[("case_id", -1)])
+    case_id = last.get('case_id', 0) if last else 0
 
-# noinspection SpellCheckingInspection
-async def get_last_case_id(bot, guild):
-    logs = await get_guild_mod_logs(bot, guild)
-    await update_log_caseids(bot, guild)
+    # $max so two racing seeds can't wind the counter backwards
+    await bot.counters.update_one({"_id": guild.id}, {'$max': {"case_id": case_id}}, upsert=True)
+    return case_id
 
-    if not logs:
-        case_id = 1
 
-    else:
-        try:
-            case_id = int(logs[-1]["case_id"]) + 1
+async def next_case_id(bot, guild):
+    """
+    Atomically claim the next case ID for a guild
+    """
+    data = await bot.counters.find_one_and_update(
+        {"_id": guild.id}, {'$inc': {"case_id": 1}}, return_document=ReturnDocument.AFTER)
 
-        except KeyError:
-            case_id = 1
+    if not data:
+        await _seed_case_counter(bot, guild)
+        data = await bot.counters.find_one_and_update(
+            {"_id": guild.id}, {'$inc': {"case_id": 1}}, return_document=ReturnDocument.AFTER)
 
-    return case_id
+    return data['case_id']
 
 
-async def _create_log(bot, member, guild, action, moderator, reason):
+def _create_log(bot, member, guild, action, moderator, reason, case_id):
     """
-    Create a new log object in the database
+    Queue a new log object to be written to the database
     """
-    case_id = await get_last_case_id(bot, guild)
-
     schema = {
         "guild_id": guild.id,
         "case_id": case_id,
@@ -413,7 +453,7 @@ async def _create_log(bot, member, guild, action, moderator, reason):
         "reason": reason,
         "time": dt.utcnow()
     }
-    await bot.mod.insert_one(schema)
+    bot.mod_buffer.add(schema)
 
 
 # noinspection PyUnusedLocal
@@ -422,12 +462,11 @@ async def update_log(bot, case_id, guild, action, reason):
     Update a mod log
     Used to update reasons for punishments
     """
-    logs = await get_guild_mod_logs(bot, guild)
-
     schema = {
         "action": action,
         "reason": reason
     }
+    await bot.mod_buffer.flush()  # the case might not be written yet
     await bot.mod.update_one({"guild_id": guild.id, "case_id": case_id}, {"$set": schema}, upsert=True)
 
 
@@ -451,18 +490,14 @@ async def starboard_embed(message, payload):
     return em
 
 
-async def update_log_caseids(bot, guild):
-    logs = await get_guild_mod_logs(bot, guild)
-
-    for i, log in enumerate(logs, start=1):
-        if i != log['case_id']:
-            await bot.mod.update_one(
-                {"guild_id": guild.id, "case_id": log['case_id']}, {"$set": {"case_id": i}}, upsert=True)
-
-
 async def delete_log(bot, id, guild):
-    await bot.mod.delete_one({"guild_id": guild.id, "case_id": id})
-    await update_log_caseids(bot, guild)
+    """
+    Delete a mod log. Case IDs are never reused, so this just leaves a gap.
+    Returns whether the case existed.
+    """
+    await bot.mod_buffer.flush()
+    result = await bot.mod.delete_one({"guild_id": guild.id, "case_id": id})
+    return bool(result.deleted_count)
 
 
 def clean_codeblock(content):
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import aiohttp
+
+from .cache import LRUCache
+
+__all__ = ('HTTPClient',)
+
+DEFAULT_APIS = {
+    'some-random-api': 'https://some-random-api.ml',
+}
+
+
+class HTTPClient:
+    """
+    The bot's one HTTP client.
+
+    Owns a single pooled ClientSession (made on first use, so it's made inside the running loop)
+    with per-host connection limits and timeouts. API base URLs can be overridden from the
+    `apis` section of config.json, which is how you point the bot at a local stand-in server.
+    Successful JSON responses can be cached for a few seconds, and the cached copy is also
+    handed back if the API falls over before it expires.
+    """
+
+    def __init__(self, apis=None, timeout=10, limit=100, limit_per_host=10, cache_size=256):
+        self.apis = {**DEFAULT_APIS, **(apis or {})}
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self._cache = LRUCache(cache_size)  # url -> (expires, data)
+        self._session = None
+
+    @property
+    def hits(self):
+        return self._cache.hits
+
+    @property
+    def misses(self):
+        return self._cache.misses
+
+    @property
+    def session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host))
+
+        return self._session
+
+    def url(self, api, path):
+        return self.apis[api].rstrip('/') + '/' + path.lstrip('/')
+
+    async def get_json(self, url, ttl=None, **kwargs):
+        """
+        GET some JSON. Returns (status, data), data is None for anything but a 200.
+        Timeouts and connection errors come back as a 503 so callers only have one thing to check.
+        """
+        cached = self._cache.get(url) if ttl else None
+        if cached is not None and cached[0] > time.monotonic():
+            return 200, cached[1]
+
+        try:
+            async with self.session.get(url, **kwargs) as response:
+                if response.status != 200:
+                    status, data = response.status, None
+
+                else:
+                    status, data = 200, await response.json(content_type=None)
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            status, data = 503, None
+
+        if status == 200:
+            if ttl:
+                self._cache.set(url, (time.monotonic() + ttl, data))
+
+        elif cached is not None:  # stale is better than nothing
+            return 200, cached[1]
+
+        return status, data
+
+    async def gather_json(self, *urls, ttl=None):
+        """
+        Fetch several URLs at once, returns a list of (status, data) in the same order
+        """
+        return await asyncio.gather(*(self.get_json(url, ttl=ttl) for url in urls))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
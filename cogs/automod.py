@@ -1,7 +1,4 @@
-import collections
-import re
-
-from better_profanity import profanity
+from discord.ext import tasks
 
 from assets import *
 from .moderation import mute_members
@@ -13,133 +10,83 @@ log = logging.getLogger(__name__)
 class AutoMod(commands.Cog, name='Auto Moderation'):
     def __init__(self, bot):
         self.bot = bot
-        self._cache = {}
-
-    async def get_censor_words(self):
-        with open(self.bot.path + '/assets/profanity.txt', 'r') as f:
-            file = f.read()
-
-        return file.split('\n')
+        self.spam = SpamDetector()
+        self._censors = {}
+        self.spam_task = self.sweep_spam.start()
+        bot.pipeline.add_stage('automod', self.check_message, order=10)
 
-    async def profanity_command_check(self, message: discord.Message):
-        starts, prefix = False, None
-        content = message.content
-        for _prefix in await retrieve_raw_prefix(self.bot, message):
-            if content.startswith(_prefix):
-                starts = True
-                prefix = _prefix
+    def cog_unload(self):
+        self.spam_task.cancel()
+        self.bot.pipeline.remove_stage('automod')
 
-        if not starts:
-            return False
-        content = content.replace(prefix, '')
-        if self.bot.get_command(content[:2]) or self.bot.get_command(content[:1]):
-            return True
-
-        else:
-            return False
+    @tasks.loop(minutes=5)
+    async def sweep_spam(self):
+        # forget about everyone who hasn't said anything in a while
+        self.spam.sweep()
 
-    async def cog_check(self, ctx: commands.Context) -> bool:
-        if not ctx.guild or not ctx.author.guild_permissions.manage_guild:
-            return False
-        return True
+    async def get_censor_words(self):
+        return list(load_wordlist(self.bot.path + '/assets/profanity.txt'))
 
-    async def update_cache(self, message: discord.Message):
+    def get_censor(self, guild_id, words):
         """
-        Update the bot's message cache.
+        Get the compiled matcher for a guild's word list.
+        Only recompiled when the list changes, the config cache hands out the same list until then.
         """
         try:
-            if not self._cache[message.author.id]:
-                self._cache[message.author.id] = []
+            _words, censor = self._censors[guild_id]
+            if _words is words:
+                return censor
 
         except KeyError:
-            self._cache[message.author.id] = []
+            pass
 
-        self._cache[message.author.id].append(message)
+        censor = compile_censor(words or load_wordlist(self.bot.path + '/assets/profanity.txt'))
+        self._censors[guild_id] = words, censor
+        return censor
 
-    def get_cache(self, member) -> list or None:
+    def profanity_command_check(self, ctx):
         """
-        Retrieve a member's message cache.
+        Whether the message is someone using the profanity commands, they'll have curse words in them
         """
-        try:
-            for message in self._cache[member.id]:
-                # filter out all items in the self._cache that were created more than 5 seconds ago
-                if message.created_at - timedelta(seconds=3) > dt.utcnow():
-                    self._cache[member.id].remove(message)
-
-                return self._cache[member.id]
-
-        except KeyError:
-            return []
+        command = self.bot.get_command(ctx.invoked) if ctx.invoked else None
+        return command is not None and command.qualified_name == 'profanity'
 
-    def is_spamming(self, member):
-        cache = self.get_cache(member)
-
-        if len(cache) > 5:
-            return True
-
-        return False
+    async def cog_check(self, ctx: commands.Context) -> bool:
+        if not ctx.guild or not ctx.author.guild_permissions.manage_guild:
+            return False
+        return True
 
-    async def delete_cache(self, member):
+    async def check_message(self, ctx):
         """
-        Delete a member's cache.
+        The automod stage of the message pipeline
         """
-        try:
-            if not self._cache[member.id]:
-                log.info("Request to clear cache on member without a previous cache.")
-                return False
-
-            self._cache.pop(member.id)
-
-        except KeyError:
-            return False
-
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if not message.guild or message.author.bot:
+        message, _data = ctx.message, ctx.config
+        if not message.guild or not _data:
             return
 
-        _data = await self.bot.config.find_one({"_id": message.guild.id})
-        msg = message.content.lower()
-        await self.update_cache(message)
-
         try:
-            if _data['profanity_toggle']:  # check if profanity is enabled
-                try:
-                    if _data['words']:  #
-                        profanity.load_censor_words(_data['words'])
-
-                except KeyError:
-                    profanity.load_censor_words_from_file(
-                        self.bot.path + '/assets/profanity.txt')
+            if _data.get('profanity_toggle'):  # check if profanity is enabled
+                censor = self.get_censor(message.guild.id, _data.get('words'))
 
                 # anti-profanity
-                if (
-                        # message just has plain profanity
-                        profanity.contains_profanity(msg) or
-                        profanity.contains_profanity(
-                            msg.replace(' ', '')) or  # message has spaces and remove the spaces
-                        profanity.contains_profanity(
-                            re.sub(r'[^\w\s]', '', msg)) or  # message has punctuation, remove punctuation
-                        # message has invis unicode character
-                        profanity.contains_profanity(msg.replace('­', '')) or
-                        profanity.contains_profanity(
-                            "".join(collections.OrderedDict.fromkeys(msg)))  # duplicate chars
-                ):
-                    if await self.profanity_command_check(message): return # make sure that they're not adding a word
+                if censor.contains_words(ctx.words):
+                    if self.profanity_command_check(ctx): return # make sure that they're not adding a word
                     # in that case then don't do stuff
 
+                    ctx.stop()  # it's gone, nothing else needs to look at it
                     await message.delete()
                     em = discord.Embed(
                         description=f"{WARNING} That word is not allowed in **{message.guild}**!",
                         colour=GOLD)
                     await message.channel.send(embed=em)
 
-            if _data['spam_toggle'] and self.is_spamming(message.author):
-                to_delete = len(self.get_cache(message.author))
-                await self.delete_cache(message.author)
-                data = await self.bot.config.find_one({"_id": message.guild.id})
+            if _data.get('spam_toggle') and self.spam.record(
+                    message, _data.get('spam_window', 3), _data.get('spam_threshold', 5),
+                    _data.get('spam_repeats')):
+                to_delete = self.spam.count(message.guild.id, message.author.id)
+                self.spam.clear(message.guild.id, message.author.id)
                 try:
-                    whitelist = data['spam_whitelist']
+                    whitelist = _data['spam_whitelist']
                     if message.author.id in whitelist: return
                     # check that the author isn't in the spam whitelist
 
@@ -155,8 +102,6 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
 
                 try:
                     # purge the spam messages sent by the author
-                    # I originally had the check to be lambda m: m in self.get_cache but it just didn't quite work
-                    # because I was emptying the cache after the messages were purged
                     await message.channel.purge(
                         limit=to_delete,
                         check=lambda m: m.author == message.author)  # make sure that the message author is the spammer
@@ -164,6 +109,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
                 except discord.NotFound or discord.NoMoreItems or asyncio.QueueEmpty:
                     pass
 
+                ctx.stop()  # purged, don't bother running it as a command
                 if not message.author.guild_permissions.manage_messages:
                     # mute the member, only if they can't mute other people so they have mute invincibility
                     await mute_members(self.bot, message, message.author,
@@ -193,7 +139,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
     )
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def toggle_profanity(self, ctx):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if not data['profanity_toggle']:
                 toggle = False
@@ -203,8 +149,8 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
         except KeyError or TypeError:
             toggle = False
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"profanity_toggle": not toggle}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"profanity_toggle": not toggle}}, upsert=True)
         status = "enabled" if not toggle else "disabled"
         em = discord.Embed(
             description=f"{CHECK} {status.title()} anti-profanity.",
@@ -225,7 +171,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
         else:
             words = []
 
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         if words and word in words:
             em = discord.Embed(
                 description=f"{ERROR} That word is already recognized as a curse word.",
@@ -238,7 +184,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
                 words.append(word)
 
             else:
-                words = data['words']
+                words = list(data['words'])
                 if word in words:
                     em = discord.Embed(
                         description=f"{ERROR} That word is already recognized as a curse word.",
@@ -250,8 +196,8 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
         except KeyError or TypeError:
             words.append(word)
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"words": words}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"words": words}}, upsert=True)
 
         if word != '-default':
             await ctx.message.delete()
@@ -272,13 +218,13 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
     async def remove_curse(self, ctx, *, word: str):
         words = await self.get_censor_words()
 
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if not data['words']:
                 words.remove(word)
 
             else:
-                words = data['words']
+                words = list(data['words'])
                 if word not in words:
                     em = discord.Embed(
                         description=f"{ERROR} That word is not recognized as a curse word.",
@@ -290,8 +236,8 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
         except KeyError or TypeError:
             words.remove(word)
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"words": words}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"words": words}}, upsert=True)
         await ctx.message.delete()
 
         em = discord.Embed(
@@ -306,8 +252,8 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
     )
     @commands.cooldown(1, 3, commands.BucketType.member)
     async def clear_curses(self, ctx):
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$unset': {"words": 1}})
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$unset': {"words": 1}})
         em = discord.Embed(
             description=f"{CHECK} Deleted all recognized curse words.",
             color=GREEN)
@@ -329,7 +275,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
     )
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def toggle_antispam(self, ctx):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if not data['spam_toggle']:
                 toggle = False
@@ -339,14 +285,56 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
         except KeyError or TypeError:
             toggle = False
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"spam_toggle": not toggle}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"spam_toggle": not toggle}}, upsert=True)
         status = "enabled" if not toggle else "disabled"
         em = discord.Embed(
             description=f"{CHECK} {status.title()} anti-spam.",
             color=GREEN)
         await ctx.send(embed=em)
 
+    @anti_spam.command(
+        name='limit',
+        aliases=['threshold', 'rate'],
+        description='Sets how many messages a member can send within a number of seconds before it counts as spam.'
+    )
+    @commands.cooldown(1, 3, commands.BucketType.guild)
+    async def spam_limit(self, ctx, messages: int, seconds: int):
+        if not 2 <= messages <= 20 or not 1 <= seconds <= 60:
+            em = discord.Embed(
+                description=f"{ERROR} The limit must be between 2 and 20 messages, within 1 to 60 seconds.",
+                colour=RED)
+            return await ctx.send(embed=em)
+
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"spam_threshold": messages, "spam_window": seconds}},
+                                           upsert=True)
+        em = discord.Embed(
+            description=f"{CHECK} Sending more than `{messages}` messages "
+                        f"within `{convert_time(seconds)}` now counts as spam.",
+            color=GREEN)
+        await ctx.send(embed=em)
+
+    @anti_spam.command(
+        name='repeats',
+        aliases=['duplicates', 'copies'],
+        description='Sets how many times a member can send the same message within the spam limit\'s time '
+                    'before it counts as spam. By default it\'s half the message limit, and at least 2.'
+    )
+    @commands.cooldown(1, 3, commands.BucketType.guild)
+    async def spam_repeats(self, ctx, messages: int):
+        if not 1 <= messages <= 20:
+            em = discord.Embed(
+                description=f"{ERROR} The limit must be between 1 and 20 messages.",
+                colour=RED)
+            return await ctx.send(embed=em)
+
+        await self.bot.config_cache.update(ctx.guild.id, {'$set': {"spam_repeats": messages}}, upsert=True)
+        em = discord.Embed(
+            description=f"{CHECK} Sending the same message more than `{messages}` times now counts as spam.",
+            color=GREEN)
+        await ctx.send(embed=em)
+
     @anti_spam.command(
         name='whitelist',
         aliases=['disablefor', 'untrack'],
@@ -354,13 +342,13 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
     )
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def whitelist_antispamspam(self, ctx, member: discord.Member):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if not data['spam_whitelist']:
                 whitelist = []
 
             else:
-                whitelist = data['spam_whitelist']
+                whitelist = list(data['spam_whitelist'])
 
         except KeyError or TypeError:
             whitelist = []
@@ -373,8 +361,8 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
 
         whitelist.append(member.id)
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"spam_whitelist": whitelist}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"spam_whitelist": whitelist}}, upsert=True)
         em = discord.Embed(
             description=f"{CHECK} Added {member.mention} to the anti-spam whitelist.",
             color=GREEN)
@@ -387,7 +375,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
     )
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def unwhitelist_antispamspam(self, ctx, member: discord.Member):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if not data['spam_whitelist']:
                 em = discord.Embed(
@@ -396,7 +384,7 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
                 return await ctx.send(embed=em)
 
             else:
-                whitelist = data['spam_whitelist']
+                whitelist = list(data['spam_whitelist'])
 
         except KeyError or TypeError:
             em = discord.Embed(
@@ -412,8 +400,8 @@ class AutoMod(commands.Cog, name='Auto Moderation'):
 
         whitelist.remove(member.id)
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"spam_whitelist": whitelist}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"spam_whitelist": whitelist}}, upsert=True)
         em = discord.Embed(
             description=f"{CHECK} Removed {member.mention} from the anti-spam whitelist.",
             color=GREEN)
@@ -44,7 +44,7 @@ class Config(commands.Cog):
         if prefix != "--":
             prefix = prefix.replace("--", " ")
 
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if prefix in flatten(data['prefix']):
                 em = discord.Embed(
@@ -68,7 +68,7 @@ class Config(commands.Cog):
                 colour=RED)
             return await ctx.send(embed=em)
 
-        await self.bot.config.update_one({"_id": ctx.guild.id}, {'$set': {"prefix": prefixes}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id, {'$set': {"prefix": prefixes}}, upsert=True)
         em = discord.Embed(
             description=f"{CHECK} `{prefix}` has been added as a prefix.",
             colour=GREEN)
@@ -83,7 +83,7 @@ class Config(commands.Cog):
         if prefix != "--":
             prefix = prefix.replace("--", " ")
 
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             if not data or len(data['prefix']) < 1:
                 em = discord.Embed(
@@ -97,12 +97,12 @@ class Config(commands.Cog):
                 colour=RED)
             return await ctx.send(embed=em)
 
-        prefixes = data["prefix"]
+        prefixes = list(data["prefix"]) if isinstance(data["prefix"], list) else data["prefix"]
 
         if isinstance(prefixes, str): pass
         else: prefixes.remove(prefix)
 
-        await self.bot.config.update_one({"_id": ctx.guild.id}, {'$set': {"prefix": prefixes}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id, {'$set': {"prefix": prefixes}}, upsert=True)
         em = discord.Embed(
             description=f"{CHECK} `{prefix}` has been removed as a prefix.",
             colour=GREEN)
@@ -130,8 +130,8 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def set_moderator_role(self, ctx, role: discord.Role):
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"mod_role": role.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"mod_role": role.id}}, upsert=True)
         em = discord.Embed(
             description=f"{CHECK} The moderator role has been assigned to {role.mention}",
             colour=GREEN)
@@ -145,7 +145,7 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def mod_role_del(self, ctx):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             mod_role = ctx.guild.get_role(data['mod_role'])
             if not mod_role:
@@ -184,8 +184,8 @@ class Config(commands.Cog):
             await ctx.send(embed=em)
             return
 
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$unset': {"mod_role": None}})
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$unset': {"mod_role": None}})
 
         em = discord.Embed(
             description=f"{CHECK} The moderator role has been deleted.",
@@ -200,7 +200,7 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def mod_role_create(self, ctx):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             mod_role = ctx.guild.get_role(data['mod_role'])
             if mod_role:
@@ -227,8 +227,8 @@ class Config(commands.Cog):
         mod_role = await ctx.guild.create_role(
             name='Moderator', permissions=perms, reason='Could not find a muted role')
 
-        await self.bot.config.update_one({"_id": ctx.guild.id},
-                                         {'$set': {"mod_role": mod_role.id}}, upsert=True)
+        await self.bot.config_cache.update(ctx.guild.id,
+                                           {'$set': {"mod_role": mod_role.id}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} The moderator role was created.",
@@ -255,8 +255,8 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def mute_role_set(self, ctx, role: discord.Role):
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"mute_role": role.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"mute_role": role.id}}, upsert=True)
         em = discord.Embed(
             description=f"{CHECK} The mute role has been assigned to {role.mention}",
             colour=GREEN)
@@ -270,7 +270,7 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def mute_role_del(self, ctx):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             mute_role = ctx.guild.get_role(data['mute_role'])
             if not mute_role:
@@ -307,8 +307,8 @@ class Config(commands.Cog):
             await ctx.send(embed=em)
             return
 
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$unset': {"mute_role": None}})
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$unset': {"mute_role": None}})
 
         em = discord.Embed(
             description=f"{CHECK} The mute role has been deleted.",
@@ -323,7 +323,7 @@ class Config(commands.Cog):
     @commands.has_permissions(administrator=True)
     @commands.cooldown(1, 3, commands.BucketType.guild)
     async def mute_role_create(self, ctx):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             mod_role = ctx.guild.get_role(data['mute_role'])
             if mod_role:
@@ -340,18 +340,10 @@ class Config(commands.Cog):
         mute_role = await ctx.guild.create_role(name='Muted', colour=RED, permissions=perms,
                                                 reason='Could not find a muted role')
 
-        for channel in ctx.guild.channels:
-            try:
-                await channel.set_permissions(mute_role, read_messages=True, send_messages=False)
+        await sync_mute_overwrites(self.bot, ctx.guild, mute_role)
 
-            except discord.Forbidden:
-                continue
-
-            except discord.HTTPException:
-                continue
-
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"mute_role": mute_role.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"mute_role": mute_role.id}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} The mute role was created.",
@@ -364,8 +356,8 @@ class Config(commands.Cog):
         description='The command to change the settings for the message log channel.',
     )
     async def message_logs(self, ctx, channel: discord.TextChannel):
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"message_logs": channel.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"message_logs": channel.id}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} The `message logs` channel was set to {channel.mention}.",
@@ -378,8 +370,8 @@ class Config(commands.Cog):
         description='The command to change the settings for the moderation log channel.',
     )
     async def mod_logs(self, ctx, channel: discord.TextChannel):
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"mod_logs": channel.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"mod_logs": channel.id}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} The `moderation logs` channel was set to {channel.mention}.",
@@ -392,8 +384,8 @@ class Config(commands.Cog):
         description='The command to change the settings for the member log channel.',
     )
     async def member_logs(self, ctx, channel: discord.TextChannel):
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"member_logs": channel.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"member_logs": channel.id}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} The `member logs` channel was set to {channel.mention}.",
@@ -415,8 +407,8 @@ class Config(commands.Cog):
         description='Set the starboard channel to a channel.'
     )
     async def set_starboard(self, ctx, channel: discord.TextChannel):
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"starboard": channel.id}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"starboard": channel.id}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} The `starboard` channel was set to {channel.mention}.",
@@ -435,8 +427,8 @@ class Config(commands.Cog):
                 colour=RED)
             return await ctx.send(embed=em)
 
-        await self.bot.config.update_one(
-            {"_id": ctx.guild.id}, {'$set': {"count": stars}}, upsert=True)
+        await self.bot.config_cache.update(
+            ctx.guild.id, {'$set': {"count": stars}}, upsert=True)
 
         em = discord.Embed(
             description=f"{CHECK} Messages now require `{stars}` stars to get on the starboard.",
@@ -33,13 +33,70 @@ class Dev(commands.Cog):
         #         colour=RED)
         #     await ctx.send(embed=em)
 
+    @commands.command(
+        name='slowqueries',
+        aliases=['slowq', 'queries'],
+        description='A developer command. Shows the slowest database query shapes. '
+                    'Sort by `total`, `max` or `avg`, or pass `reset` to start over.')
+    async def slow_queries(self, ctx, n: t.Optional[int] = 10, sort: str = 'total'):
+        if sort.lower() == 'reset':
+            self.bot.slow_queries.reset()
+            em = discord.Embed(
+                description=f"{CHECK} Cleared the query stats.",
+                colour=GREEN)
+            return await ctx.send(embed=em)
+
+        if sort.lower() not in ('total', 'max', 'avg'):
+            em = discord.Embed(
+                description=f"{ERROR} Can only sort by `total`, `max` or `avg`.",
+                colour=RED)
+            return await ctx.send(embed=em)
+
+        rows = self.bot.slow_queries.top(max(1, min(n, 25)), sort.lower())
+        em = discord.Embed(
+            title=f'Slowest query shapes (by {sort.lower()})',
+            colour=MAIN,
+            timestamp=dt.utcnow())
+        for collection, operation, shape, count, total, slowest in rows:
+            em.add_field(
+                name=f"{collection or '?'}.{operation}",
+                value=f"```{shape[:900]}```{count:,} runs, {total * 1000:,.0f}ms total, "
+                      f"{total / count * 1000:,.1f}ms avg, {slowest * 1000:,.1f}ms max",
+                inline=False)
+
+        if not rows:
+            em.description = 'No queries recorded yet.'
+
+        await ctx.send(embed=em)
+
+    @commands.command(
+        name='indexes',
+        aliases=['indices', 'schema'],
+        description='A developer command. Reports missing and unused database indexes.')
+    async def index_report(self, ctx):
+        report = await self.bot.schema.report()
+        em = discord.Embed(
+            title=f'Database indexes (schema version {await self.bot.schema.version()})',
+            colour=MAIN,
+            timestamp=dt.utcnow())
+        for collection, (missing, unused) in report.items():
+            em.add_field(
+                name=collection,
+                value=(f"Missing: `{', '.join(missing)}`\n" if missing else '') +
+                      (f"Unused: `{', '.join(unused)}`" if unused else ''),
+                inline=False)
+
+        if not report:
+            em.description = f"{CHECK} Every declared index exists and all of them are being used."
+
+        await ctx.send(embed=em)
+
     @commands.command(
         name='blacklist',
         aliases=['bl'],
         description='A developer command. Blacklists a user from using the bot.')
     async def blacklist_cmd(self, ctx, member: discord.Member, *, reason: t.Optional[str] = 'no reason provided'):
-        await self.bot.blacklists.update_one({"_id": member.id},
-                                             {'$set': {"reason": reason}}, upsert=True)
+        await self.bot.blacklist.add(member.id, reason)
 
         em = discord.Embed(
             description=f"{CHECK} Blacklisted {member.mention} for **{reason}**.",
@@ -52,14 +109,11 @@ class Dev(commands.Cog):
         aliases=['ubl'],
         description='A developer command. Unblacklists a user from using the bot.')
     async def unblacklist_cmd(self, ctx, member: discord.Member, *, reason: t.Optional[str] = 'no reason provided'):
-        try:
-            await self.bot.blacklists.delete_one({"_id": member.id})
-
-        except commands.MemberNotFound:
+        if not await self.bot.blacklist.remove(member.id):
             em = discord.Embed(
                 description=f"{ERROR} {member.mention} is not blacklisted from this bot.",
                 colour=RED)
-            await ctx.send(embed=em)
+            return await ctx.send(embed=em)
 
         em = discord.Embed(
             description=f"{CHECK} Unblacklisted {member.mention} for **{reason}**.",
@@ -149,6 +203,7 @@ class Dev(commands.Cog):
                 if _cmd.parent == cmd:
                     _cmd.enabled = not _cmd.enabled
 
+            self.bot.help_index.invalidate()
             status = "enabled" if cmd.enabled else "disabled"
             em = discord.Embed(
                 description=f"{CHECK} {status.title()} `{cmd.qualified_name}` and its subcommands.",
@@ -27,7 +27,7 @@ class ErrorHandler(commands.Cog):
 
             em = Embed(
                 description=f"{ERROR} Invalid argument `{parameter}` passed\n"
-                            f"{await syntax(ctx.command)}",
+                            f"{self.bot.help_index.syntax(ctx.command)}",
                 colour=RED)
             await ctx.send(embed=em)
 
@@ -55,7 +55,7 @@ class ErrorHandler(commands.Cog):
 
             em = Embed(
                 description=f"{ERROR} Invalid argument `{parameter}` passed\n"
-                            f"{await syntax(ctx.command)}",
+                            f"{self.bot.help_index.syntax(ctx.command)}",
                 colour=RED)
             await ctx.send(embed=em)
 
@@ -86,14 +86,14 @@ class ErrorHandler(commands.Cog):
         elif isinstance(exc, commands.BadArgument):
             em = Embed(
                 description=f"{ERROR} Invalid argument passed\n"
-                            f"{await syntax(ctx.command)}",
+                            f"{self.bot.help_index.syntax(ctx.command)}",
                 colour=RED)
             await ctx.send(embed=em)
 
         elif isinstance(exc, commands.InvalidEndOfQuotedStringError):
             em = Embed(
                 description=f"{ERROR} Invalid argument passed\n"
-                            f"{await syntax(ctx.command)}",
+                            f"{self.bot.help_index.syntax(ctx.command)}",
                 colour=RED)
             await ctx.send(embed=em)
 
@@ -146,6 +146,13 @@ class ErrorHandler(commands.Cog):
                 color=RED)
             await ctx.send(embed=em)
 
+        elif isinstance(exc, InvalidPurgeFilter):
+            em = discord.Embed(
+                description=f"{ERROR} {exc}\n"
+                            f"```Example: from:@someone (link or invite) -contains:\"hello\" after:2h```",
+                color=RED)
+            await ctx.send(embed=em)
+
         elif isinstance(exc, IsAdministrator):
             em = discord.Embed(
                     description=f"{ERROR} This member has the `administrator` permission.",
@@ -1,10 +1,16 @@
+import os
+
+import better_profanity
 import DiscordUtils
-from better_profanity import profanity
 
 from assets import *
 
 log = logging.getLogger(__name__)
 
+# better_profanity's bundled word list, compiled once instead of reloaded on every event
+DEFAULT_CENSOR = compile_censor(load_wordlist(
+    os.path.join(os.path.dirname(better_profanity.__file__), 'profanity_wordlist.txt')))
+
 
 class Events(commands.Cog):
     def __init__(self, bot):
@@ -18,6 +24,10 @@ class Events(commands.Cog):
             "Take a chill pill!"
         ]
         self.tracker = DiscordUtils.InviteTracker(self.bot)
+        bot.pipeline.add_stage('mention', self.mention_reply, order=20)
+
+    def cog_unload(self):
+        self.bot.pipeline.remove_stage('mention')
 
     @commands.Cog.listener()  # invite tracking
     # may implement some better invite tracking later on, too lazy lol
@@ -39,22 +49,29 @@ class Events(commands.Cog):
     @commands.Cog.listener()
     async def on_guild_remove(self, guild):
         await self.tracker.remove_guild_cache(guild)
+        self.bot.config_cache.evict(guild.id)
 
-    @commands.Cog.listener()
-    async def on_message(self, message):
-        if message.content == f"<@!{self.bot.user.id}>":
-            try:
-                em = discord.Embed(
-                    description=f":bell: The prefix(es) for `{message.guild}` is currently "
-                                f"set to `{await retrieve_prefix(self.bot, message)}`",
-                    color=GOLD)
-                await message.channel.send(embed=em)
+    async def mention_reply(self, ctx):
+        """
+        Tell people the prefix when they ping the bot
+        """
+        if not ctx.guild or not ctx.mentions_only_bot:
+            return
 
-            except TypeError:
-                em = discord.Embed(
-                    description=f":bell: Your guild does not have any set prefixes!",
-                    color=GOLD)
-                await message.channel.send(embed=em)
+        ctx.stop()
+        prefix = format_prefix((ctx.config or {}).get('prefix') or default_prefix)
+        if prefix:
+            em = discord.Embed(
+                description=f":bell: The prefix(es) for `{ctx.guild}` is currently "
+                            f"set to `{prefix}`",
+                color=GOLD)
+
+        else:
+            em = discord.Embed(
+                description=f":bell: Your guild does not have any set prefixes!",
+                color=GOLD)
+
+        await ctx.message.channel.send(embed=em)
 
     @commands.Cog.listener()
     async def on_member_join(self, member):
@@ -63,7 +80,7 @@ class Events(commands.Cog):
         """
         try:
             if self.bot.muted_users[member.id]:
-                data = await self.bot.config.find_one({"_id": member.guild.id})
+                data = await self.bot.config_cache.get(member.guild.id)
                 mute_role = member.guild.get_role(data['mute_role'])
                 if mute_role:
                     await member.add_roles(mute_role, reason='Role Persists', atomic=True)
@@ -76,7 +93,7 @@ class Events(commands.Cog):
         if not member.bot:
             inviter = await self.tracker.fetch_inviter(member)  # get the inviter of the member
             guild = member.guild
-            data = await self.bot.config.find_one({"_id": guild.id})
+            data = await self.bot.config_cache.get(guild.id)
             try:
                 member_logs = member.guild.get_channel(data['member_logs'])
 
@@ -100,7 +117,7 @@ class Events(commands.Cog):
         Fires when a member leaves the server
         """
         if not member.bot:
-            data = await self.bot.config.find_one({"_id": member.guild.id})
+            data = await self.bot.config_cache.get(member.guild.id)
             try:
                 member_logs = member.guild.get_channel(data['member_logs'])
 
@@ -123,19 +140,10 @@ class Events(commands.Cog):
         Fires when a message is deleted
         """
         if not message.author.bot:
-            profanity.load_censor_words()
-            if profanity.contains_profanity(message.content): return
-            schema = {
-                "_id": message.id,
-                "channel": message.channel.id,
-                "author": message.author.id,
-                "content": message.content,
-                "guild": message.guild.id,
-                "time": dt.utcnow()
-            }
-            self.bot.snipes[message.id] = schema
+            if DEFAULT_CENSOR.contains_profanity(message.content): return
+            self.bot.snipes.add(Snipe(message, message.content))
 
-            data = await self.bot.config.find_one({"_id": message.guild.id})
+            data = await self.bot.config_cache.get(message.guild.id)
             try:
                 message_logs = message.guild.get_channel(data['message_logs'])
 
@@ -161,23 +169,13 @@ class Events(commands.Cog):
         """
 
         if not after.author.bot:
-            profanity.load_censor_words()
-            if profanity.contains_profanity(after.content):
+            if DEFAULT_CENSOR.contains_profanity(after.content):
                 await after.delete()
                 return await after.channel.send("That word is not allowed in **{}**".format(after.guild))
 
-            schema = {
-                "_id": after.id,
-                "channel": after.channel.id,
-                "author": after.author.id,
-                "before": before.content,
-                "after": after.content,
-                "guild": after.guild.id,
-                "time": dt.utcnow()
-            }
-            self.bot.edit_snipes[after.id] = schema
+            self.bot.edit_snipes.add(Snipe(after, after.content, before.content))
 
-            data = await self.bot.config.find_one({"_id": after.guild.id})
+            data = await self.bot.config_cache.get(after.guild.id)
             try:
                 message_logs = after.guild.get_channel(data['message_logs'])
 
@@ -204,7 +202,7 @@ class Events(commands.Cog):
             message = await (self.bot.get_guild(payload.guild_id).get_channel(payload.channel_id).
                              fetch_message(payload.message_id))
 
-            data = await self.bot.config.find_one({"_id": message.guild.id})
+            data = await self.bot.config_cache.get(message.guild.id)
             try:
                 if not data['starboard']:
                     return
@@ -264,7 +262,7 @@ class Events(commands.Cog):
         if payload.emoji.name == "⭐":
             message = await (self.bot.get_guild(payload.guild_id).get_channel(payload.channel_id).
                              fetch_message(payload.message_id))
-            data = await self.bot.config.find_one({"_id": message.guild.id})
+            data = await self.bot.config_cache.get(message.guild.id)
             try:
                 if not data['starboard']:
                     return
@@ -320,7 +318,7 @@ class Events(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_update(self, before, after):
-        data = await self.bot.config.find_one({"_id": after.guild.id})
+        data = await self.bot.config_cache.get(after.guild.id)
         try:
             if not data['mute_role']: return
         except TypeError or KeyError: return
@@ -328,6 +326,7 @@ class Events(commands.Cog):
         mute_role = after.guild.get_role(data['mute_role'])
 
         if (mute_role in before.roles) and (mute_role not in after.roles):
+            self.bot.expiries.cancel(('mute', after.id))
             try:
                 await self.bot.mutes.delete_one({"_id": after.id})
                 self.bot.muted_users.pop(after.id)
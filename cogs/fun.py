@@ -1,10 +1,8 @@
 import typing as t
-from aiohttp import request
 from assets import *
 import random
 import asyncio
-from PIL import Image
-from io import BytesIO
+import time
 
 log = logging.getLogger(__name__)
 
@@ -16,6 +14,11 @@ class Fun(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
+        self.duel_images = DuelImages(self.bot.path + "/assets/versus.jpg")
+        self.edit_budget = EditBudget()
+
+    def cog_unload(self):
+        self.duel_images.close()
 
     @commands.command(
         name='echo',
@@ -57,39 +60,33 @@ class Fun(commands.Cog):
     @commands.cooldown(
         1, 3, commands.BucketType.member)
     async def fact_cmd(self, ctx, animal: str):
-        if animal.lower() in ("dog", "cat", 'panda', 'fox', 'bird', 'koala'):
-            URL = f'https://some-random-api.ml/facts/{animal.lower()}'
-            IMAGE_URL = f"https://some-random-api.ml/img/{'birb' if animal == 'bird' else animal.lower()}"
-
-            async with request('GET', IMAGE_URL, headers={}) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    image_link = data['link']
-
-                else:
-                    image_link = None
-
-            async with request('GET', URL, headers={}) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    fact_em = discord.Embed(
-                        title=f"Did you know?",
-                        description=data['fact'],
-                        color=MAIN)
-                    if IMAGE_URL is not None:
-                        fact_em.set_image(url=image_link)
-                    return await ctx.send(embed=fact_em)
-
-                if response.status == 503:
-                    status = discord.Embed(
-                        description=f"{ERROR} API is currently offline",
-                        color=RED)
-                    await ctx.send(embed=status)
-                else:
-                    status = discord.Embed(
-                        description=f"{ERROR} API returned with a response status `{response.status}`",
-                        color=RED)
-                    await ctx.send(embed=status)
+        animal = animal.lower()
+        if animal in ("dog", "cat", 'panda', 'fox', 'bird', 'koala'):
+            web = self.bot.web
+            (status, data), (_, image) = await web.gather_json(
+                web.url('some-random-api', f'facts/{animal}'),
+                web.url('some-random-api', f"img/{'birb' if animal == 'bird' else animal}"),
+                ttl=30)
+
+            if status == 200:
+                fact_em = discord.Embed(
+                    title=f"Did you know?",
+                    description=data['fact'],
+                    color=MAIN)
+                if image and image.get('link'):
+                    fact_em.set_image(url=image['link'])
+                return await ctx.send(embed=fact_em)
+
+            if status == 503:
+                status = discord.Embed(
+                    description=f"{ERROR} API is currently offline",
+                    color=RED)
+                await ctx.send(embed=status)
+            else:
+                status = discord.Embed(
+                    description=f"{ERROR} API returned with a response status `{status}`",
+                    color=RED)
+                await ctx.send(embed=status)
         else:
             no_facts = discord.Embed(
                 description=f"{ERROR} I could not find any facts for animal `{animal}`",
@@ -254,9 +251,10 @@ class Fun(commands.Cog):
         aliases=['fight'],
         description='Duel another person! Attacks are random.'
     )
-    async def duel_member(self, ctx, member: discord.Member):
-        p1, p2, play = Dueler(ctx.author), Dueler(member), True
-        order = [(p1, p2), (p2, p1)]
+    async def duel_member(self, ctx, member: discord.Member, mode: t.Optional[str] = None):
+        turns, winner = simulate_duel(ctx.author.name, member.name)
+        names = ctx.author.name, member.name
+        winner = (ctx.author, member)[winner]
 
         em = discord.Embed(
             title=f'Duel between {ctx.author.name} and {member.name}',
@@ -265,69 +263,49 @@ class Fun(commands.Cog):
         )
         em.set_footer(text='Damage amounts are generated via the random module.')
 
-        versus = Image.open(self.bot.path + "/assets/versus.jpg")
-
-        asset, _asset = ctx.author.avatar_url_as(size=128), member.avatar_url_as(size=128)
-        data, _data = BytesIO(await asset.read()), BytesIO(await _asset.read())
-        p1_pfp, p2_pfp = Image.open(data), Image.open(_data)
+        if mode and mode.lower() in ('gif', 'animated', 'fast'):
+            # the whole fight in one message, no edits at all
+            async with ctx.typing():
+                image = await self.duel_images.animate((ctx.author, member), turns)
 
-        p1_pfp = p1_pfp.resize((164, 164))
-        p2_pfp = p2_pfp.resize((164, 164))
+            em.title = f":trophy: {winner.name.upper()} WINS!"
+            em.colour = GOLD
+            em.set_image(url="attachment://duel.gif")
+            return await ctx.send(file=discord.File(image, filename='duel.gif'), embed=em)
 
-        versus.paste(p1_pfp, (39, 63))
-        versus.paste(p2_pfp, (416, 214))
-
-        versus.save(self.bot.path + "/assets/profile.jpg")
-        file = discord.File(self.bot.path + "/assets/profile.jpg", filename='profile.jpg')
+        image = await self.duel_images.render(ctx.author, member)
+        file = discord.File(image, filename='profile.jpg')
         em.set_image(url=f"attachment://profile.jpg")
         msg = await ctx.send(file=file, embed=em)
 
         await asyncio.sleep(3)
-        await msg.edit(embed=em)
+        await self.replay_duel(msg, em, names, turns)
 
-        text = []
-        while play:
-            for attacker, defender in order:
-                if attacker.health < 1:
-                    play = False
-                    break
-
-                elif defender.health < 1:
-                    play = False
-                    break
-
-                amount = random.randint(10, 50)
-                will_attack = random.choice([True, False, True])
-
-                # if it returns True then member attacks
-                # it's a 2/3 chance that the member will attack
-                symbol, colour = '+' if not will_attack else '-', \
-                                 DIFF_GREEN if not will_attack else DIFF_RED
-                if not will_attack:
-                    text.append("{} {}".format(symbol, random.choice(DUEL_HEAL_MESSAGES).format(attacker.name, amount)))
-                    attacker.heal(amount if not (attacker.health + amount > 100) else (100 - attacker.health))
-
-                else:
-                    text.append("{} {}".format(
-                        symbol, random.choice(DUEL_ATTACK_MESSAGES).format(attacker.name, defender.name, amount)))
-                    defender.damage(amount if not (defender.health - amount < 0) else defender.health)
-
-                em.description = "**{}** - {} HP\n**{}** - {} HP\n```diff\n{}```".format(
-                    p1.name, p1.health, p2.name, p2.health,
-                    '\n'.join(text[len(text) - 8:] if len(text) > 8 else text)
-                )
-
-                em.colour = colour
-                await msg.edit(embed=em)
-                await asyncio.sleep(1)
-
-        winner = p1 if p1.health > p2.health else p2
-        # noinspection PyUnusedLocal
-        loser = p1 if winner == p2 else p2
-        em.title = f":trophy: {winner.member.name.upper()} WINS!"
+        em.title = f":trophy: {winner.name.upper()} WINS!"
         em.colour = GOLD
+        await self.edit_budget.acquire(msg.channel.id)
         await msg.edit(embed=em)
 
+    async def replay_duel(self, msg, em, names, turns, pace=1.0, batch=2):
+        """
+        Show a precomputed duel. Turns are revealed at `pace` seconds each, but several are merged
+        into one edit (at least `batch`, more if the channel's edit budget makes us wait).
+        """
+        start, shown = time.monotonic(), 0
+        while shown < len(turns):
+            await asyncio.sleep(max(0.0, start + (shown + batch - 1) * pace - time.monotonic()))
+            await self.edit_budget.acquire(msg.channel.id)
+
+            due = int((time.monotonic() - start) / pace) + 1
+            shown = min(len(turns), max(shown + batch, due))
+            turn = turns[shown - 1]
+            log_lines = [turn.line for turn in turns[max(0, shown - 8):shown]]
+            em.description = "**{}** - {} HP\n**{}** - {} HP\n```diff\n{}```".format(
+                names[0], turn.health[0], names[1], turn.health[1], '\n'.join(log_lines))
+
+            em.colour = DIFF_GREEN if turn.heal else DIFF_RED
+            await msg.edit(embed=em)
+
 
 def setup(bot):
     bot.add_cog(Fun(bot))
@@ -28,26 +28,13 @@ class HelpMenu(menus.ListPageSource):
                 timestamp=dt.utcnow())
 
         desc = self.bot.get_cog(cog).description
+        listing, count = self.bot.help_index.page(cog)
 
         text = f"{desc if desc else 'No description provided.'}```\n**Commands in the {cog} cog**```diff\n"
-
-        for command in self.bot.get_cog(cog).walk_commands():
-            if command.hidden or not command.enabled:
-                if command.parent is not None:
-                    text += f"-   {command.name}\n"
-
-                else:
-                    text += f"- {command.name}\n"
-
-            elif command.parent is not None:
-                text += f"    {command.name}\n"
-
-            else:
-                text += f"{command.name}\n"
+        text += listing
 
         em.add_field(name="Description", value=f"```{text}```", inline=False)
-        em.set_footer(text=f"{offset:,} of {len_data:,} cogs | "
-                           f"{len([cmd for cmd in self.bot.get_cog(cog).walk_commands()])} commands in {cog} cog")
+        em.set_footer(text=f"{offset:,} of {len_data:,} cogs | {count} commands in {cog} cog")
 
         return em
 
@@ -72,13 +59,7 @@ class Help(commands.Cog):
     @commands.cooldown(1, 3, commands.BucketType.member)
     async def help(self, ctx, *, entity: t.Optional[str]):
         if not entity:
-            cogs = [c for c in self.bot.cogs.keys()]
-            cogs.remove('Events')
-            cogs.remove('Help')
-            cogs.remove('Dev')
-            cogs.remove('Reaction Roles')
-            cogs.remove('ErrorHandler')
-            cogs.remove('Jishaku')
+            cogs = self.bot.help_index.cogs
 
             help_menu = menus.MenuPages(source=HelpMenu(ctx, cogs, self.bot), delete_message_after=True)
 
@@ -99,22 +80,13 @@ class Help(commands.Cog):
                              value=command.description if command.description else "No description for this "
                                                                                    "command.",
                              inline=False)
-                em.add_field(name='Syntax', value=await syntax(command), inline=False)
+                em.add_field(name='Syntax', value=self.bot.help_index.syntax(command), inline=False)
                 em.add_field(name='Aliases',
                              value=f"```{', '.join(command.aliases)}```" if command.aliases else "No aliases for "
                                                                                                  "this command.")
-                if hasattr(command, "all_commands"):
-                    _subcommands = []
-                    subcommands = [cmd for cmd in command.cog.walk_commands()]
-                    for cmd in subcommands:
-                        if cmd.parent == command:
-                            _subcommands.append(cmd.name)
-
-                    if not len(_subcommands):
-                        pass
-
-                    else:
-                        em.add_field(name='Subcommands', value='```\n' + '\n'.join(_subcommands) + '```', inline=False)
+                subcommands = self.bot.help_index.subcommands(command)
+                if subcommands:
+                    em.add_field(name='Subcommands', value='```\n' + '\n'.join(subcommands) + '```', inline=False)
 
                 em.set_footer(text='Invoked by ' + ctx.author.name,
                               icon_url=self.bot.user.avatar_url)
@@ -1,27 +1,23 @@
-import os
-import re
 import typing as t
 from copy import deepcopy
-from glob import glob
 
 import pytimeparse as pytp
 from dateutil.relativedelta import relativedelta
-from discord.ext import tasks
 
 from assets import *
 
 
 # noinspection PyTypeChecker
-class GuildPunishmentsMenu(menus.ListPageSource):
-    def __init__(self, ctx, data, bot):
+class GuildPunishmentsMenu(MongoPageSource):
+    def __init__(self, ctx, bot):
         self.ctx = ctx
         self.bot = bot
 
-        super().__init__(data, per_page=10)
+        super().__init__(bot.mod, {"guild_id": ctx.guild.id}, 'case_id', per_page=10)
 
     async def write_cases(self, menu, punishments):
         offset = (menu.current_page * self.per_page) + 1
-        len_data = len(self.entries)
+        len_data = self.total
 
         em = discord.Embed(
             title=f'{self.ctx.guild}\'s Moderation Cases',
@@ -36,10 +32,11 @@ class GuildPunishmentsMenu(menus.ListPageSource):
             em.set_footer(text=f"{offset:,} - {min(len_data, offset + self.per_page - 1):,} "
                                f"of {len_data:,} punishments")
 
+            users = await self.bot.user_resolver.resolve(case['member'] for case in punishments)
             for case in punishments:
                 case_id = case['case_id']
                 action = case['action']
-                user = self.bot.get_user(case['member']) or (await self.bot.fetch_user(case['member']))
+                user = users[case['member']] or case['member']
                 reason = case['reason']
                 em.add_field(
                     name=f'{case_id}. {action} on {user}',
@@ -52,17 +49,17 @@ class GuildPunishmentsMenu(menus.ListPageSource):
 
 
 # noinspection PyTypeChecker
-class PunishmentsMenu(menus.ListPageSource):
-    def __init__(self, ctx, data, bot, member):
+class PunishmentsMenu(MongoPageSource):
+    def __init__(self, ctx, bot, member):
         self.ctx = ctx
         self.bot = bot
         self.member = member
 
-        super().__init__(data, per_page=10)
+        super().__init__(bot.mod, {"guild_id": ctx.guild.id, "member": member.id}, 'case_id', per_page=10)
 
     async def write_cases(self, menu, punishments):
         offset = (menu.current_page * self.per_page) + 1
-        len_data = len(self.entries)
+        len_data = self.total
 
         em = discord.Embed(
             title='Moderation Cases',
@@ -112,9 +109,11 @@ class ActiveModerationsMenu(menus.ListPageSource):
         else:
             em.set_footer(text=f"{offset:,} - {min(len_data, offset + self.per_page - 1):,} "
                                f"of {len_data:,} active punishments")
+            users = await self.bot.user_resolver.resolve(
+                value["_id"] for item in active_mods for value in item.values())
             for item in active_mods:
                 for key, value in item.items():
-                    user = self.bot.get_user(value["_id"]) or await self.bot.fetch_user(value['_id'])
+                    user = users[value["_id"]]
                     try:
                         end_time = value["at"] + relativedelta(seconds=value["duration"])
 
@@ -131,7 +130,7 @@ class ActiveModerationsMenu(menus.ListPageSource):
                             until_end = 'Indefinite'
 
                     em.add_field(name=f'{str(value["type"]).title()}',
-                                 value=f"**Member** - {user.mention}\n"
+                                 value=f"**Member** - {user.mention if user else value['_id']}\n"
                                        f"**Ends at** - "
                                        f"{str(end_time)[:-7] if not str(end_time).isalpha() else end_time}\n"
                                        f"**Time left** - {until_end}",
@@ -142,12 +141,24 @@ class ActiveModerationsMenu(menus.ListPageSource):
     async def format_page(self, menu, entries):
         return await self.write_cases(menu, entries)
 
+def schedule_expiry(bot, _type, schema):
+    """
+    Schedule a timed mute or ban to be lifted, or cancel it if it's now indefinite
+    """
+    if schema['duration']:
+        bot.expiries.schedule((_type, schema['_id']), schema['at'] + timedelta(seconds=schema['duration']))
+
+    else:
+        bot.expiries.cancel((_type, schema['_id']))
+
 async def kick_members(bot, ctx, member, reason):
     """
     Kick members
     """
-    await create_log(bot, member, ctx.guild, 'kick', ctx.author if ctx.author != member else ctx.guild.me, reason)
-    await member.kick(reason=f"{ctx.author if ctx.author != member else ctx.guild.me} - " + reason)
+    moderator = ctx.author if ctx.author != member else ctx.guild.me
+    await notify_member(member, ctx.guild, 'kick', moderator, reason)
+    await member.kick(reason=f"{moderator} - " + reason)
+    return await create_log(bot, member, ctx.guild, 'kick', moderator, reason, notify=False)
 
 async def ban_members(bot, ctx, member, reason, time=None, delete_days=None, _type='ban'):
     """
@@ -164,14 +175,23 @@ async def ban_members(bot, ctx, member, reason, time=None, delete_days=None, _ty
         }
         await bot.bans.update_one({"_id": member.id}, {'$set': schema}, upsert=True)
         bot.banned_users[member.id] = schema
+        schedule_expiry(bot, 'ban', schema)
 
-    await create_log(bot, member, ctx.guild, _type, ctx.author if ctx.author != member else ctx.guild.me, reason)
-    await ctx.guild.ban(member, reason=f"{ctx.author if ctx.author != member else ctx.guild.me} - "
-                                       + reason, delete_message_days=delete_days)
+    else:
+        # a permanent ban replaces any timed one, which would otherwise unban them when it ran out
+        bot.expiries.cancel(('ban', member.id))
+        bot.banned_users.pop(member.id, None)
+        await bot.bans.delete_one({"_id": member.id})
+
+    moderator = ctx.author if ctx.author != member else ctx.guild.me
+    await notify_member(member, ctx.guild, _type, moderator, reason)
+    await ctx.guild.ban(member, reason=f"{moderator} - " + reason, delete_message_days=delete_days)
     if _type == 'softban':
         await asyncio.sleep(0.5)
         await ctx.guild.unban(member, reason=f"{ctx.author} - softban")
 
+    return await create_log(bot, member, ctx.guild, _type, moderator, reason, notify=False)
+
 async def unban_members(bot, ctx, member, reason):
     """
     Unban members
@@ -184,7 +204,7 @@ async def unban_members(bot, ctx, member, reason):
             raise commands.MemberNotFound(member)
 
     elif isinstance(member, int):
-        user = await bot.fetch_user(member)
+        user = await bot.user_resolver.get(member)
         if not user:
             raise commands.MemberNotFound(member)
 
@@ -194,15 +214,13 @@ async def unban_members(bot, ctx, member, reason):
         except Exception:
             raise commands.MemberNotFound(member)
 
-    user = bot.get_user(member) or member
-
-    try:
-        bot.banned_users.pop(user.id)
-
-    except KeyError:
-        pass
+    user_id = member if isinstance(member, int) else member.id
+    bot.banned_users.pop(user_id, None)
+    bot.expiries.cancel(('ban', user_id))
+    await bot.bans.delete_one({"_id": user_id})
 
-    await create_log(bot, member, ctx.guild, "unban", ctx.author if ctx.author != member else ctx.guild.me, reason)
+    return await create_log(bot, member, ctx.guild, "unban", ctx.author if ctx.author != member else ctx.guild.me,
+                            reason)
 
 
 async def mute_members(bot, ctx, member: discord.Member, reason, mute_role, time=None):
@@ -224,7 +242,8 @@ async def mute_members(bot, ctx, member: discord.Member, reason, mute_role, time
 
     await bot.mutes.update_one({"_id": member.id}, {'$set': schema}, upsert=True)
     bot.muted_users[member.id] = schema
-    await create_log(
+    schedule_expiry(bot, 'mute', schema)
+    return await create_log(
         bot, member, ctx.guild, 'mute', ctx.author if
         ctx.author != member else ctx.guild.me, reason, convert_time(time))
 
@@ -232,6 +251,7 @@ async def unmute_members(bot, ctx, member: discord.Member, reason, mute_role):
     """
     Unmute members
     """
+    bot.expiries.cancel(('mute', member.id))
     try:
         await bot.mutes.delete_one({"_id": member.id})
         bot.muted_users.pop(member.id)
@@ -242,7 +262,7 @@ async def unmute_members(bot, ctx, member: discord.Member, reason, mute_role):
     await member.remove_roles(mute_role,
                               reason=f"{ctx.author if ctx.author != member else 'automod'} - {reason}")
     try:
-        await create_log(bot, member, ctx.guild, 'unmute', ctx.author, reason)
+        return await create_log(bot, member, ctx.guild, 'unmute', ctx.author, reason)
 
     except discord.Forbidden:
         pass
@@ -252,7 +272,8 @@ async def warn_members(bot, ctx, member, reason):
     Warn members
     """
     try:
-        await create_log(bot, member, ctx.guild, 'warn', ctx.author if ctx.author != member else 'automod', reason)
+        return await create_log(bot, member, ctx.guild, 'warn', ctx.author if ctx.author != member else 'automod',
+                                reason)
 
     except discord.Forbidden:
         pass
@@ -288,109 +309,77 @@ class Mod(commands.Cog, name='Moderation'):
 
     def __init__(self, bot):
         self.bot = bot
-        self.purge_task = self.purge_files.start()
-        self.mod_task = self.update_modlogs.start()
-        self.check_mods = self.check_mods.start()
+        self.bot.expiries = self.expiries = ExpiryScheduler(self.expire_punishment)
+        self.load_task = self.bot.loop.create_task(self.load_punishments())
 
     def cog_unload(self):
-        self.mod_task.cancel()
-        self.purge_task.cancel()
-
-    @tasks.loop(minutes=1)
-    async def update_modlogs(self):
-        for guild in self.bot.guilds:
-            await update_log_caseids(self.bot, guild)
+        self.load_task.cancel()
+        self.expiries.stop()
 
-    @tasks.loop(seconds=30)
-    async def purge_files(self):
-        for file in glob(self.bot.path + '/purge_txts/*.txt'):
-            os.unlink(file)
-
-    @tasks.loop(seconds=1)
-    async def check_mods(self):
-        current_time = dt.utcnow()
-        mutes = deepcopy(self.bot.muted_users)
-        bans = deepcopy(self.bot.banned_users)
-
-        # mutes stuff
-        for key, value in mutes.items():
-            guild = self.bot.get_guild(value['guild_id'])
-
-            member = guild.get_member(value['_id']) or await self.bot.fetch_user(value['_id'])
-
-            data = await self.bot.config.find_one({"_id": guild.id})
-            mute_role = guild.get_role(data['mute_role'])
+    async def load_punishments(self):
+        """
+        Load every active mute and ban, and schedule the timed ones to expire
+        """
+        await self.bot.wait_until_ready()
+        self.expiries.clear()
 
-            join_delta = dt.utcnow() - member.joined_at
+        async for document in self.bot.mutes.find({}):
+            self.bot.muted_users[document["_id"]] = document
+            schedule_expiry(self.bot, 'mute', document)
 
-            if mute_role not in member.roles and join_delta > timedelta(seconds=3):
-                try:
-                    await self.bot.mutes.delete_one({"_id": member.id})
-                    self.bot.muted_users.pop(member.id)
+        async for document in self.bot.bans.find({}):
+            self.bot.banned_users[document["_id"]] = document
+            schedule_expiry(self.bot, 'ban', document)
 
-                except commands.MemberNotFound or KeyError:
-                    pass
+        self.expiries.start()
 
-                continue
+    async def expire_punishment(self, key):
+        _type, member_id = key
+        if _type == 'mute':
+            await self.expire_mute(member_id)
 
-            if value['duration'] is None:
-                continue
-
-            unmute_time = value['at'] + relativedelta(seconds=value['duration'])
-
-            if current_time >= unmute_time:
-                try:
-                    await self.bot.mutes.delete_one({"_id": member.id})
-                    self.bot.muted_users.pop(member.id)
-
-                except commands.MemberNotFound or KeyError:
-                    pass
-                
-                if isinstance(member, discord.Member):
-                    if mute_role in member.roles:
-                        await member.remove_roles(mute_role, reason='Mute time expired')
+        else:
+            await self.expire_ban(member_id)
 
-            else:
-                if member in guild.members:
-                    if self.bot.muted_users[member.id] and (mute_role not in member.roles):
-                        await member.remove_roles(mute_role, reason='Mute time expired', atomic=True)
+    async def expire_mute(self, member_id):
+        value = self.bot.muted_users.pop(member_id, None)
+        if not value:
+            return
 
-                        try:
-                            await self.bot.mutes.delete_one({"_id": member.id})
-                            self.bot.muted_users.pop(member.id)
+        await self.bot.mutes.delete_one({"_id": member_id})
 
-                        except commands.MemberNotFound or KeyError:
-                            pass
+        guild = self.bot.get_guild(value['guild_id'])
+        if not guild:
+            return
 
-        for key, value in bans.items():
-            if value['duration'] is None:
-                continue
+        data = await self.bot.config_cache.get(guild.id)
+        try:
+            mute_role = guild.get_role(data['mute_role'])
 
-            unban_time = value['at'] + relativedelta(seconds=value['duration'])
+        except (KeyError, TypeError):
+            return
 
-            guild = self.bot.get_guild(value['guild_id'])
-            member = self.bot.get_user(value['_id']) or await self.bot.fetch_user(value['_id'])
+        member = guild.get_member(member_id)
+        # if they left, there's nothing to take off, and they won't get it back when they rejoin
+        if member and mute_role in member.roles:
+            await member.remove_roles(mute_role, reason='Mute time expired')
 
-            if current_time >= unban_time:
-                try:
-                    await self.bot.bans.delete_one({"_id": member.id})
-                    self.bot.banned_users.pop(member.id)
-                    await guild.unban(user=member, reason="Ban time expired")
+    async def expire_ban(self, member_id):
+        value = self.bot.banned_users.pop(member_id, None)
+        if not value:
+            return
 
-                except discord.NotFound or commands.MemberNotFound or KeyError:
-                    pass
+        await self.bot.bans.delete_one({"_id": member_id})
 
-    @check_mods.before_loop
-    async def before_check_mods(self):
-        await self.bot.wait_until_ready()
+        guild = self.bot.get_guild(value['guild_id'])
+        if not guild:
+            return
 
-    @purge_files.before_loop
-    async def before_purge_files(self):
-        await self.bot.wait_until_ready()
+        try:
+            await guild.unban(discord.Object(id=member_id), reason="Ban time expired")
 
-    @update_modlogs.before_loop
-    async def before_update_modlogs(self):
-        await self.bot.wait_until_ready()
+        except discord.NotFound:
+            pass
 
     @commands.command(
         name='cases',
@@ -401,8 +390,8 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.guild_only()
     async def check_punishments(self, ctx, member: t.Optional[discord.User]):
         member = member or ctx.author
-        punishments = await get_member_mod_logs(self.bot, member, ctx.guild)
-        menu = menus.MenuPages(source=PunishmentsMenu(ctx, punishments, self.bot, member), delete_message_after=True)
+        await self.bot.mod_buffer.flush()
+        menu = menus.MenuPages(source=PunishmentsMenu(ctx, self.bot, member), delete_message_after=True)
 
         await menu.start(ctx)
 
@@ -414,8 +403,8 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.cooldown(1, 3, commands.BucketType.member)
     @commands.guild_only()
     async def check_guild_punishments(self, ctx):
-        punishments = await get_guild_mod_logs(self.bot, ctx.guild)
-        menu = menus.MenuPages(source=GuildPunishmentsMenu(ctx, punishments, self.bot), delete_message_after=True)
+        await self.bot.mod_buffer.flush()
+        menu = menus.MenuPages(source=GuildPunishmentsMenu(ctx, self.bot), delete_message_after=True)
 
         await menu.start(ctx)
 
@@ -428,24 +417,23 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(manage_messages=True)
     @commands.guild_only()
     async def delete_punishment(self, ctx, case_id: int):
-        logs = await get_guild_mod_logs(self.bot, ctx.guild)
-
-        if len(logs) > case_id:
-            if case_id > 0:
-                await delete_log(self.bot, case_id, ctx.guild)
-
-            else:
-                em = discord.Embed(
-                    description=f"{ERROR} Cases can't go into the negatives! It's just common sense.",
-                    colour=RED)
-                await ctx.send(embed=em)
+        if case_id < 1:
+            em = discord.Embed(
+                description=f"{ERROR} Cases can't go into the negatives! It's just common sense.",
+                colour=RED)
+            return await ctx.send(embed=em)
 
-        else:
+        if not await delete_log(self.bot, case_id, ctx.guild):
             em = discord.Embed(
                 description=f"{ERROR} An invalid case ID was given."
-                            f"```Please pick from {len(logs)} cases```",
+                            f"```Case no. {case_id} does not exist```",
                 colour=RED)
-            await ctx.send(embed=em)
+            return await ctx.send(embed=em)
+
+        em = discord.Embed(
+            description=f"{CHECK} Deleted case no. `{case_id}`.",
+            colour=GREEN)
+        await ctx.send(embed=em)
 
     @commands.command(
         name='viewcase',
@@ -455,30 +443,32 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.cooldown(1, 3, commands.BucketType.member)
     @commands.guild_only()
     async def view_case(self, ctx, case_id: int):
-        logs = await get_guild_mod_logs(self.bot, ctx.guild)
-
-        for i, log in enumerate(logs, start=1):
-            if i == case_id:
-                em = discord.Embed(
-                    colour=MAIN,
-                    timestamp=log['time']
-                )
-                moderator = self.bot.get_user(log["moderator"])
-                member = self.bot.get_user(log["member"])
-                em.set_thumbnail(url=member.avatar_url)
-                em.set_author(icon_url=moderator.avatar_url, name=f'Case no. {log["case_id"]} - {log["action"]}')
-                em.add_field(name='Member', value=member.mention)
-                em.add_field(name='Actioned By', value=moderator.mention)
-                em.add_field(name='Reason', value=log['reason'])
-                em.set_footer(text="Actioned at")
-                return await ctx.send(embed=em)
-
-        else:
+        await self.bot.mod_buffer.flush()  # include cases that haven't been written yet
+        log = await self.bot.mod.find_one({"guild_id": ctx.guild.id, "case_id": case_id})
+        if log is None:
+            count = await self.bot.mod.count_documents({"guild_id": ctx.guild.id})
             em = discord.Embed(
                 description=f"{ERROR} An invalid case ID was given."
-                            f"```Please pick from {len(logs)} cases```",
+                            f"```Please pick from {count} cases```",
                 colour=RED)
-            await ctx.send(embed=em)
+            return await ctx.send(embed=em)
+
+        em = discord.Embed(
+            colour=MAIN,
+            timestamp=log['time']
+        )
+        users = await self.bot.user_resolver.resolve((log["moderator"], log["member"]))
+        moderator, member = users[log["moderator"]], users[log["member"]]
+        if member:
+            em.set_thumbnail(url=member.avatar_url)
+
+        em.set_author(icon_url=moderator.avatar_url if moderator else discord.Embed.Empty,
+                      name=f'Case no. {log["case_id"]} - {log["action"]}')
+        em.add_field(name='Member', value=member.mention if member else log["member"])
+        em.add_field(name='Actioned By', value=moderator.mention if moderator else log["moderator"])
+        em.add_field(name='Reason', value=log['reason'])
+        em.set_footer(text="Actioned at")
+        await ctx.send(embed=em)
 
     @commands.command(
         name='moderations',
@@ -506,13 +496,13 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(kick_members=True)
     async def kick_cmd(self, ctx, member: discord.Member, *, reason: t.Optional[str] = "no reason provided"):
         if await mod_check(ctx, member):
+            case_id = await kick_members(self.bot, ctx, member, reason)
             em = discord.Embed(
                 description=f"{CHECK} Kicked {member.mention} for `{reason}`",
                 timestamp=dt.utcnow(),
                 colour=GREEN)
-            em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+            em.set_footer(text=f"Case no. {case_id}")
             await ctx.send(embed=em)
-            await kick_members(self.bot, ctx, member, reason)
 
     @commands.command(
         name='ban',
@@ -535,13 +525,13 @@ class Mod(commands.Cog, name='Moderation'):
         if isinstance(member, discord.Member):
             if await mod_check(ctx, member): pass
 
+        case_id = await ban_members(self.bot, ctx, member, reason, delete_days=delete_days)
         em = discord.Embed(
             description=f"{CHECK} Banned {member.mention} for `{reason}`",
             timestamp=dt.utcnow(),
             colour=GREEN)
+        em.set_footer(text=f"Case no. {case_id}")
         await ctx.send(embed=em)
-        em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
-        await ban_members(self.bot, ctx, member, reason, delete_days=delete_days)
 
     @commands.command(
         name='softban',
@@ -553,13 +543,13 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(ban_members=True)
     async def softban_cmd(self, ctx, member: discord.Member, *, reason: t.Optional[str] = "no reason provided"):
         if await mod_check(ctx, member):
+            case_id = await ban_members(self.bot, ctx, member, reason, delete_days=7, _type='softban')
             em = discord.Embed(
                 description=f"{CHECK} Softbanned {member.mention} for `{reason}`",
                 timestamp=dt.utcnow(),
                 colour=GREEN)
-            em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+            em.set_footer(text=f"Case no. {case_id}")
             await ctx.send(embed=em)
-            await ban_members(self.bot, ctx, member, reason, delete_days=7, _type='softban')
 
     @commands.command(
         name='tempban',
@@ -595,12 +585,12 @@ class Mod(commands.Cog, name='Moderation'):
         except KeyError:
             pass
 
-        await ban_members(self.bot, ctx, member, reason, time, delete_days=7, _type='tempban')
+        case_id = await ban_members(self.bot, ctx, member, reason, time, delete_days=7, _type='tempban')
         em = discord.Embed(
             description=f"{CHECK} Tempbanned {member.mention} lasting `{convert_time(time)}`"
                         f", for `{reason}`", timestamp=dt.utcnow(),
             colour=GREEN)
-        em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+        em.set_footer(text=f"Case no. {case_id}")
         await ctx.send(embed=em)
 
     @commands.command(
@@ -613,12 +603,12 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(ban_members=True)
     async def unban_cmd(self, ctx, member: t.Union[discord.User, int],
                         *, reason: t.Optional[str] = 'no reason provided'):
-        await unban_members(self.bot, ctx, member, reason)
+        case_id = await unban_members(self.bot, ctx, member, reason)
         em = discord.Embed(
             description=f"{CHECK} Unbanned {member.mention} for `{reason}`",
             timestamp=dt.utcnow(),
             colour=GREEN)
-        em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+        em.set_footer(text=f"Case no. {case_id}")
         await ctx.send(embed=em)
 
     @commands.command(
@@ -630,13 +620,13 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.cooldown(1, 3, commands.BucketType.member)
     async def warn_cmd(self, ctx, member: discord.Member, *, reason: t.Optional[str] = "no reason provided"):
         if await mod_check(ctx, member):
+            case_id = await warn_members(self.bot, ctx, member, reason)
             em = discord.Embed(
                 description=f"{CHECK} Warned {member.mention} for `{reason}`",
                 timestamp=dt.utcnow(),
                 colour=GREEN)
-            em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+            em.set_footer(text=f"Case no. {case_id}")
             await ctx.send(embed=em)
-            await warn_members(self.bot, ctx, member, reason)
 
     @commands.command(
         name='mute',
@@ -658,7 +648,7 @@ class Mod(commands.Cog, name='Moderation'):
         else: reason = ' '.join(args[1:])
         if not reason: reason = 'no reason provided'
 
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             mute_role = ctx.guild.get_role(data['mute_role'])
             if not mute_role:
@@ -694,13 +684,13 @@ class Mod(commands.Cog, name='Moderation'):
                 except KeyError:
                     pass
 
+                case_id = await mute_members(self.bot, ctx, member, reason, mute_role, time)
                 em = discord.Embed(
                     description=f"{CHECK} Muted {member.mention} lasting `{convert_time(time)}`"
                                 f", for `{reason}`", timestamp=dt.utcnow(),
                     colour=GREEN)
-                em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+                em.set_footer(text=f"Case no. {case_id}")
                 await ctx.send(embed=em)
-                await mute_members(self.bot, ctx, member, reason, mute_role, time)
 
             else:
                 em = discord.Embed(
@@ -717,7 +707,7 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.bot_has_permissions(manage_roles=True, manage_messages=True)
     async def unmute_cmd(self, ctx, member: discord.Member,
                          *, reason: t.Optional[str] = 'no reason provided'):
-        data = await self.bot.config.find_one({"_id": ctx.guild.id})
+        data = await self.bot.config_cache.get(ctx.guild.id)
         try:
             mute_role = ctx.guild.get_role(data['mute_role'])
             if not mute_role:
@@ -734,14 +724,15 @@ class Mod(commands.Cog, name='Moderation'):
 
         if await mod_check(ctx, member):
             if mute_role in member.roles:
-                await unmute_members(self.bot, ctx, member, reason, mute_role)
+                case_id = await unmute_members(self.bot, ctx, member, reason, mute_role)
                 em = discord.Embed(
                     description=f"{CHECK} Unmuted {member.mention} for `{reason}`", timestamp=dt.utcnow(),
                     colour=GREEN)
-                em.set_footer(text=f"Case no. {await get_last_case_id(self.bot, ctx.guild)}")
+                em.set_footer(text=f"Case no. {case_id}")
                 await ctx.send(embed=em)
 
             else:
+                self.bot.expiries.cancel(('mute', member.id))
                 try:
                     await self.bot.mutes.delete_one({"_id": member.id})
                     self.bot.muted_users.pop(member.id)
@@ -847,13 +838,11 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(manage_messages=True)
     @commands.bot_has_permissions(manage_messages=True)
     async def purge_match(self, ctx, limit: t.Optional[int], *, match: str):
-        def check(m):
-            return (str(match.lower())) in str(m.content).lower()
-
+        match = match.lower()
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: check(m))
+            await purge_msgs(self.bot, ctx, limit, lambda m: match in m.content.lower())
 
         else:
             raise InvalidLimit
@@ -901,10 +890,11 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(manage_messages=True)
     @commands.bot_has_permissions(manage_messages=True)
     async def purge_no_match(self, ctx, limit: t.Optional[int], *, match: str):
+        match = match.lower()
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: str(m.content).lower().find(str(match.lower())) == -1)
+            await purge_msgs(self.bot, ctx, limit, lambda m: match not in m.content.lower())
 
         else:
             raise InvalidLimit
@@ -918,10 +908,11 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(manage_messages=True)
     @commands.bot_has_permissions(manage_messages=True)
     async def purge_starts_with(self, ctx, limit: t.Optional[int], *, match: str):
+        match = match.lower()
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: str(m.content).lower().startswith(str(match.lower())))
+            await purge_msgs(self.bot, ctx, limit, lambda m: m.content.lower().startswith(match))
 
         else:
             raise InvalidLimit
@@ -935,10 +926,11 @@ class Mod(commands.Cog, name='Moderation'):
     @commands.has_permissions(manage_messages=True)
     @commands.bot_has_permissions(manage_messages=True)
     async def purge_ends_with(self, ctx, limit: t.Optional[int], *, match: str):
+        match = match.lower()
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: str(m.content).lower().endswith(str(match.lower())))
+            await purge_msgs(self.bot, ctx, limit, lambda m: m.content.lower().endswith(match))
 
         else:
             raise InvalidLimit
@@ -955,7 +947,7 @@ class Mod(commands.Cog, name='Moderation'):
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: re.search(URL_REGEX, str(m.content).lower()))
+            await purge_msgs(self.bot, ctx, limit, PurgeFilter('has:link'))
 
         else:
             raise InvalidLimit
@@ -972,7 +964,7 @@ class Mod(commands.Cog, name='Moderation'):
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: re.search(INVITE_URL_REGEX, str(m.content).lower()))
+            await purge_msgs(self.bot, ctx, limit, PurgeFilter('has:invite'))
 
         else:
             raise InvalidLimit
@@ -989,11 +981,29 @@ class Mod(commands.Cog, name='Moderation'):
         limit = limit or 100
 
         if 0 < limit < 1001:
-            await purge_msgs(self.bot, ctx, limit, lambda m: len(m.mentions))
+            await purge_msgs(self.bot, ctx, limit, PurgeFilter('has:mention'))
 
         else:
             raise InvalidLimit
 
+    @purge_cmd.command(
+        name='filter',
+        aliases=['where', 'if', 'expr'],
+        description='Purge messages matching a filter, like '
+                    '`from:@someone (link or invite) -contains:"hello" after:2h`. '
+                    'Filters: from, bot, human, contains, starts, ends, regex, has:link/invite/attachment/'
+                    'embed/mention, before, after. Combine them with `or`, `not` and brackets.'
+    )
+    @commands.cooldown(1, 3, commands.BucketType.member)
+    @commands.has_permissions(manage_messages=True)
+    @commands.bot_has_permissions(manage_messages=True)
+    async def purge_filter(self, ctx, limit: int, *, expression: str):
+        if not 0 < limit < 1001:
+            raise InvalidLimit
+
+        check = PurgeFilter(expression)
+        await purge_msgs(self.bot, ctx, limit, check, before=check.before, after=check.after)
+
     @commands.command(
         name='voicekick',
         aliases=['vck', 'vk', 'vkick'],
@@ -63,25 +63,7 @@ class Management(commands.Cog, name='Server Management'):
                              reason: t.Optional[str] = 'no reason provided'):
         conf = await ConfirmationMenu(f'mass add {role.mention}').prompt(ctx)
         if conf:
-            em = discord.Embed(
-                description=f"{SATURN} This might take a while, please wait...",
-                colour=MAIN)
-            msg = await ctx.send(embed=em)
-            added_roles = []
-            for member in ctx.guild.members:
-                if has_role in member.roles:
-                    await member.add_roles(role, reason=reason, atomic=True)
-                    added_roles.append(member)
-
-                else:
-                    continue
-
-            else:
-                await msg.delete()
-                em = discord.Embed(
-                    description=f"{CHECK} Added {role.mention} to `{len(added_roles)}` members.",
-                    colour=GREEN)
-                await ctx.send(embed=em)
+            await self.start_role_job(ctx, 'add_role', role, has_role, reason)
 
         else:
             em = discord.Embed(
@@ -97,25 +79,90 @@ class Management(commands.Cog, name='Server Management'):
     @commands.guild_only()
     @commands.has_guild_permissions(administrator=True)
     @commands.bot_has_guild_permissions(manage_roles=True)
-    async def mass_remove_roles(self, ctx, role: discord.Role, has_role: discord.Role, reason: t.Optional[str]):
+    async def mass_remove_roles(self, ctx, role: discord.Role, has_role: discord.Role,
+                                reason: t.Optional[str] = 'no reason provided'):
+        conf = await ConfirmationMenu(f'mass remove {role.mention}').prompt(ctx)
+        if conf:
+            await self.start_role_job(ctx, 'remove_role', role, has_role, reason)
+
+        else:
+            em = discord.Embed(
+                description=f"{ERROR} Action cancelled.",
+                colour=RED)
+            await ctx.send(embed=em)
+
+    async def start_role_job(self, ctx, action, role, has_role, reason):
+        if role >= ctx.guild.me.top_role:
+            em = discord.Embed(
+                description=f"{ERROR} I am not high enough in the role"
+                            f" hierarchy to perform this action.",
+                colour=RED)
+            return await ctx.send(embed=em)
+
+        # the job sends (and keeps editing) its own status message
+        await self.bot.bulk.start(ctx, action, role_id=role.id, has_role_id=has_role.id, reason=reason)
+
+    @commands.group(
+        name='jobs',
+        aliases=['job', 'bulk'],
+        description='Check on, cancel or resume mass role changes.',
+        invoke_without_command=True)
+    @commands.guild_only()
+    @commands.has_guild_permissions(administrator=True)
+    async def jobs(self, ctx, job_id: int = None):
+        if job_id is None:
+            return await ctx.invoke(self.bot.get_command('help'), entity='jobs')
+
+        job = await self.bot.bulk.get(ctx.guild.id, job_id)
+        if not job:
+            em = discord.Embed(
+                description=f"{ERROR} There is no job with the ID `{job_id}`",
+                colour=RED)
+            return await ctx.send(embed=em)
+
+        status = 'running' if self.bot.bulk.is_running(ctx.guild.id, job_id) else job['status']
         em = discord.Embed(
-            description=f"{SATURN} This might take a while, please wait...",
-            colour=MAIN)
-        msg = await ctx.send(embed=em)
-        removed_roles = []
-        for member in ctx.guild.members:
-            if has_role in member.roles:
-                await member.remove_roles(role, reason=reason, atomic=True)
-                removed_roles.append(member)
+            title=f"Job #{job_id}: {status}",
+            description=f"`{job['done']}` members done, `{job['failed']}` failed",
+            colour=MAIN,
+            timestamp=job['created'])
+        await ctx.send(embed=em)
 
-            else:
-                continue
+    @jobs.command(
+        name='cancel',
+        aliases=['stop'],
+        description='Stops a running job. It can be resumed later.')
+    @commands.guild_only()
+    @commands.has_guild_permissions(administrator=True)
+    async def jobs_cancel(self, ctx, job_id: int):
+        if await self.bot.bulk.cancel(ctx.guild.id, job_id):
+            em = discord.Embed(
+                description=f"{CHECK} Cancelled job `{job_id}`",
+                colour=GREEN)
 
         else:
-            await msg.delete()
             em = discord.Embed(
-                    description=f"{CHECK} Removed {role.mention} from `{len(removed_roles)}` members.",
-                    colour=GREEN)
+                description=f"{ERROR} Job `{job_id}` isn't running.",
+                colour=RED)
+
+        await ctx.send(embed=em)
+
+    @jobs.command(
+        name='resume',
+        aliases=['continue'],
+        description='Picks a cancelled or interrupted job back up where it left off.')
+    @commands.cooldown(1, 5, commands.BucketType.member)
+    @commands.guild_only()
+    @commands.has_guild_permissions(administrator=True)
+    @commands.bot_has_guild_permissions(manage_roles=True)
+    async def jobs_resume(self, ctx, job_id: int):
+        try:
+            await self.bot.bulk.resume(ctx.guild, ctx.channel, job_id)
+
+        except ValueError as e:
+            em = discord.Embed(
+                description=f"{ERROR} {e}",
+                colour=RED)
             await ctx.send(embed=em)
 
     @commands.command(
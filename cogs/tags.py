@@ -1,10 +1,47 @@
 import string
 import typing as t
 
+from pymongo.errors import DuplicateKeyError
+
 from assets import *
 
 log = logging.getLogger(__name__) 
 
+
+# noinspection PyTypeChecker
+class TagsMenu(MongoPageSource):
+    def __init__(self, ctx, bot):
+        self.ctx = ctx
+        self.bot = bot
+
+        super().__init__(bot.tags, {"guild_id": ctx.guild.id}, 'name', per_page=50, projection={"name": 1})
+
+    async def format_page(self, menu, tags):
+        em = discord.Embed(
+            title='{0}\'s Tags ({1})'.format(self.ctx.guild, self.total), colour=MAIN)
+
+        names, length = [], 2
+        for tag in tags:
+            # tag names can be any length, keep clear of the 4096 character description limit
+            if length + len(tag['name']) + 2 > 4000:
+                break
+
+            names.append(tag['name'])
+            length += len(tag['name']) + 2
+
+        if not tags:
+            em.description = 'This guild does not have any tags!'
+
+        else:
+            em.description = ('`' + ', '.join(names) + '`' if names else '') + \
+                (f" +{len(tags) - len(names)} more" if len(names) < len(tags) else '')
+
+        if self.is_paginating():
+            em.set_footer(text=f"Page {menu.current_page + 1:,} of {self.get_max_pages():,}")
+
+        return em
+
+
 class Tags(commands.Cog):
     """
     The Tags cog. Includes all commands that are related to making tags.
@@ -14,31 +51,46 @@ class Tags(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.accepted_chars = string.ascii_letters + string.digits + '_-'
+        self._cache = {}  # guild id -> LRUCache of tag name -> tag document
+
+    async def get_tag(self, guild_id, name):
+        """
+        Get a single tag by name, served from the guild's hot tag cache when possible
+        """
+        cache = self._cache.get(guild_id)
+        if cache is None:
+            cache = self._cache[guild_id] = LRUCache(maxsize=50)
+
+        tag = cache.get(name)
+        if tag is None:
+            tag = await self.bot.tags.find_one({"guild_id": guild_id, "name": name})
+            if tag:
+                cache.set(name, tag)
+
+        return tag
+
+    @property
+    def hits(self):
+        return sum(cache.hits for cache in self._cache.values())
+
+    @property
+    def misses(self):
+        return sum(cache.misses for cache in self._cache.values())
+
+    def invalidate(self, guild_id, *names):
+        cache = self._cache.get(guild_id)
+        if cache is None:
+            return
 
-    async def get_tag_content(self, ctx):
-        tags = []
-        cursor = self.bot.tags.find({"guild_id": ctx.guild.id})
-        for document in await cursor.to_list(length=100):
-            tags.append(document)
-
-        return tags
+        for name in names:
+            cache.pop(name)
 
     @commands.command(
         name='tags',
         description='View all of your guild\'s tags')
     async def view_tags(self, ctx):
-        tags = await self.get_tag_content(ctx)
-        em = discord.Embed(
-            title='{0}\'s Tags ({1})'.format(ctx.guild, len(tags)), colour=MAIN)
-
-        desc = []
-        for tag in tags:
-            desc.append(tag['name'])
-
-        em.description = '`' + ', '.join(desc) + '`' if len(desc) \
-            else 'This guild does not have any tags!'
-
-        await ctx.send(embed=em)
+        menu = menus.MenuPages(source=TagsMenu(ctx, self.bot), delete_message_after=True)
+        await menu.start(ctx)
 
     @commands.group(
         name='tag',
@@ -50,33 +102,15 @@ class Tags(commands.Cog):
             await ctx.invoke(self.bot.get_command('help'), entity='tag')
             return
 
-        if member:
-            tags = []
-            cursor = self.bot.tags.find({"guild_id": ctx.guild.id, "author": member.id})
-            for document in await cursor.to_list(length=100):
-                tags.append(document)
-
-        else:
-            tags = await self.get_tag_content(ctx)
-
-        found = False
-        content = None
-
-        for tag in tags:
-            if tag['name'] == str(name):
-                if tag['guild_id'] == ctx.guild.id:
-                    content = tag['content']
-                    found = True
-
-        else:
-            if not found:
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` does not exist.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        tag = await self.get_tag(ctx.guild.id, str(name))
+        if not tag or (member and tag['author'] != member.id):
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not exist.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        await ctx.send(content)
+        await ctx.send(tag['content'])
 
     @tag_cmd.command(
         name='create',
@@ -86,34 +120,36 @@ class Tags(commands.Cog):
     async def new_tag(self, ctx, name, *, content):
 
         for letter in name:
-            if letter not in list(self.accepted_chars):
+            if letter not in self.accepted_chars:
                 em = discord.Embed(
-                    description=f"{ERROR} The tag `{content}` contains unacceptable characters. "
+                    description=f"{ERROR} The tag `{name}` contains unacceptable characters. "
                                 f"Tag names can only contain letters, digits, hyphens and underscores.",
                     colour=RED)
                 await ctx.send(embed=em)
                 return
 
-        tags = []
-        cursor = self.bot.tags.find({"guild_id": ctx.guild.id})
-        for document in await cursor.to_list(length=100):
-            tags.append(document)
-
-        for tag in tags:
-            if tag['name'] == str(name):
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` already exists.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
-
         data = {
             "guild_id": ctx.guild.id,
             "author": ctx.author.id,
             "name": name,
             "content": content
         }
-        await self.bot.tags.insert_one(data)
+        if await self.get_tag(ctx.guild.id, str(name)):
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` already exists.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
+
+        try:
+            await self.bot.tags.insert_one(data)
+
+        except DuplicateKeyError:  # someone else made it in the meantime
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` already exists.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
         em = discord.Embed(
             description=f"{CHECK} The tag `{name}` was created.",
@@ -126,31 +162,24 @@ class Tags(commands.Cog):
         description='Delets an existing tag.')
     @commands.cooldown(1, 5, commands.BucketType.member)
     async def delete_tag(self, ctx, name):
-        tags = await self.get_tag_content(ctx)
+        tag = await self.get_tag(ctx.guild.id, str(name))
 
-        found = False
+        if not tag:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not exist.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        for tag in tags:
-            if tag['name'] == str(name):
-                if tag['guild_id'] == ctx.guild.id:
-                    if tag['author'] == ctx.author.id:
-                        self.bot.tags.delete_one({"guild_id": ctx.guild.id, "name": str(name), "author": ctx.author.id})
-                        found = True
-
-                    else:
-                        em = discord.Embed(
-                            description=f"{ERROR} The tag `{name}` does not belong to you.",
-                            colour=RED)
-                        await ctx.send(embed=em)
-                        return
+        if tag['author'] != ctx.author.id:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not belong to you.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        else:
-            if not found:
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` does not exist.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        await self.bot.tags.delete_one({"guild_id": ctx.guild.id, "name": str(name), "author": ctx.author.id})
+        self.invalidate(ctx.guild.id, str(name))
 
         em = discord.Embed(
             description=f"{CHECK} The tag `{name}` was deleted.",
@@ -161,66 +190,58 @@ class Tags(commands.Cog):
         name='raw',
         description='Gets a tag\'s raw content. This means no markdown.')
     async def raw_tag(self, ctx, name):
-        tags = await self.get_tag_content(ctx)
-
-        found = False
-        content = None
-
-        for tag in tags:
-            if tag['name'] == str(name):
-                if tag['guild_id'] == ctx.guild.id:
-                    content = tag['content']
-                    found = True
+        tag = await self.get_tag(ctx.guild.id, str(name))
 
-        else:
-            if not found:
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` does not exist.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        if not tag:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not exist.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        await ctx.send('```\n' + content + '```')
+        await ctx.send('```\n' + tag['content'] + '```')
 
     @tag_cmd.command(
         name='rename',
         aliases=['retitle'],
         description='Renames a tag.')
     async def rename_tag(self, ctx, name, new_name):
-        tags = await self.get_tag_content(ctx)
+        if await self.get_tag(ctx.guild.id, str(new_name)):
+            em = discord.Embed(
+                description=f"{ERROR} A tag already exists with a name or alias `{new_name}`",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        found = False
+        tag = await self.get_tag(ctx.guild.id, str(name))
 
-        for tag in tags:
-            if tag['name'] == str(new_name):
-                em = discord.Embed(
-                    description=f"{ERROR} A tag already exists with a name or alias `{new_name}`",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        if not tag:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not exist.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
+
+        if tag['author'] != ctx.author.id:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not belong to you.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-            if tag['name'] == str(name):
-                if tag['guild_id'] == ctx.guild.id:
-                    if tag['author'] == ctx.author.id:
-                        self.bot.tags.update_one(
-                            {"guild_id": ctx.guild.id, "name": name},
-                            {'$set': {"name": new_name}}, upsert=True)
-                        found = True
-
-                    else:
-                        em = discord.Embed(
-                            description=f"{ERROR} The tag `{name}` does not belong to you.",
-                            colour=RED)
-                        await ctx.send(embed=em)
-                        return
+        try:
+            await self.bot.tags.update_one(
+                {"guild_id": ctx.guild.id, "name": str(name)},
+                {'$set': {"name": new_name}})
 
-        else:
-            if not found:
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` does not exist.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        except DuplicateKeyError:  # someone else took the name in the meantime
+            em = discord.Embed(
+                description=f"{ERROR} A tag already exists with a name or alias `{new_name}`",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
+
+        self.invalidate(ctx.guild.id, str(name), str(new_name))
 
         em = discord.Embed(
             description=f"{CHECK} The tag `{name}` was renamed to `{new_name}`",
@@ -232,33 +253,26 @@ class Tags(commands.Cog):
         aliases=['ed'],
         description='Edits a tag.')
     async def edit_tag(self, ctx, name, *, new_content):
-        tags = await self.get_tag_content(ctx)
+        tag = await self.get_tag(ctx.guild.id, str(name))
 
-        found = False
+        if not tag:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not exist.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        for tag in tags:
-            if tag['name'] == str(name):
-                if tag['guild_id'] == ctx.guild.id:
-                    if tag['author'] == ctx.author.id:
-                        self.bot.tags.update_one(
-                            {"guild_id": ctx.guild.id, "name": str(name), "author": ctx.author.id},
-                            {'$set': {"content": new_content}}, upsert=True)
-                        found = True
-
-                    else:
-                        em = discord.Embed(
-                            description=f"{ERROR} The tag `{name}` does not belong to you.",
-                            colour=RED)
-                        await ctx.send(embed=em)
-                        return
+        if tag['author'] != ctx.author.id:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not belong to you.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        else:
-            if not found:
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` does not exist.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        await self.bot.tags.update_one(
+            {"guild_id": ctx.guild.id, "name": str(name), "author": ctx.author.id},
+            {'$set': {"content": new_content}})
+        self.invalidate(ctx.guild.id, str(name))
 
         em = discord.Embed(
             description=f"{CHECK} The tag `{name}` was edited.",
@@ -270,33 +284,26 @@ class Tags(commands.Cog):
         aliases=['transferowner', 'ownership', 'author'],
         description='Transfer a tag\'s owner to someone else.')
     async def transfer_tag_ownership(self, ctx, name, new_author: discord.Member):
-        tags = await self.get_tag_content(ctx)
+        tag = await self.get_tag(ctx.guild.id, str(name))
 
-        found = False
+        if not tag:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not exist.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        for tag in tags:
-            if tag['name'] == str(name):
-                if tag['guild_id'] == ctx.guild.id:
-                    if tag['author'] == ctx.author.id:
-                        self.bot.tags.update_one(
-                            {"guild_id": ctx.guild.id, "name": str(name), "author": ctx.author.id},
-                            {'$set': {"author": new_author}}, upsert=True)
-                        found = True
-
-                    else:
-                        em = discord.Embed(
-                            description=f"{ERROR} The tag `{name}` does not belong to you.",
-                            colour=RED)
-                        await ctx.send(embed=em)
-                        return
+        if tag['author'] != ctx.author.id:
+            em = discord.Embed(
+                description=f"{ERROR} The tag `{name}` does not belong to you.",
+                colour=RED)
+            await ctx.send(embed=em)
+            return
 
-        else:
-            if not found:
-                em = discord.Embed(
-                    description=f"{ERROR} The tag `{name}` does not exist.",
-                    colour=RED)
-                await ctx.send(embed=em)
-                return
+        await self.bot.tags.update_one(
+            {"guild_id": ctx.guild.id, "name": str(name), "author": ctx.author.id},
+            {'$set': {"author": new_author.id}})
+        self.invalidate(ctx.guild.id, str(name))
 
         em = discord.Embed(
             description=f"{CHECK} The tag `{name}`'s author has "
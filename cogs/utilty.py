@@ -1,8 +1,6 @@
 import typing as t
-from copy import deepcopy
 from time import time
 
-from dateutil.relativedelta import relativedelta
 from discord.ext import tasks
 
 from assets import *
@@ -25,16 +23,11 @@ class Utility(commands.Cog):
     def cog_unload(self):
         self.snipe_task.cancel()
 
-    @tasks.loop(seconds=10)
+    @tasks.loop(minutes=5)
     async def clear_snipe_cache(self):
-        current_time = dt.utcnow()
-        snipes = deepcopy(self.bot.snipes)
-
-        for key, value in snipes.items():
-            clear_time = value['time'] + relativedelta(seconds=600)
-
-            if current_time >= clear_time:
-                self.bot.snipes.pop(value['_id'])
+        # reads already drop expired snipes, this only catches channels nobody snipes in
+        self.bot.snipes.prune()
+        self.bot.edit_snipes.prune()
 
     @clear_snipe_cache.before_loop
     async def before_clear_snipe_cache(self):
@@ -142,29 +135,14 @@ class Utility(commands.Cog):
                          f"{f'from {member.mention}' if member else ''}" \
                          f" in the last 10 minutes."
 
-        if self.bot.snipes:
-            for key, value in reversed(self.bot.snipes.items()):
-                if value['guild'] == ctx.guild.id:
-                    if channel:
-                        if value['channel'] == channel.id:
-                            pass
-
-                        else:
-                            continue
-
-                    if member:
-                        if value['author'] == member.id:
-                            pass
-
-                        else:
-                            continue
-
-                    user = self.bot.get_user(value['author'])
-                    em.set_author(name=user,
-                                  icon_url=user.avatar_url)
-                    em.description = value['content']
-                    em.timestamp = value['time']
-                    break
+        snipe = self.bot.snipes.latest(
+            ctx.guild.id, channel.id if channel else None, member.id if member else None)
+        if snipe:
+            user = self.bot.get_user(snipe.author_id)
+            em.set_author(name=user,
+                          icon_url=user.avatar_url)
+            em.description = snipe.content
+            em.timestamp = snipe.time
 
         await ctx.send(embed=em)
 
@@ -182,30 +160,15 @@ class Utility(commands.Cog):
                          f"{f'from {member.mention}' if member else ''}" \
                          f" in the last 10 minutes."
 
-        if self.bot.edit_snipes:
-            for key, value in reversed(self.bot.edit_snipes.items()):
-                if value['guild'] == ctx.guild.id:
-                    if channel:
-                        if value['channel'] == channel.id:
-                            pass
-
-                        else:
-                            continue
-                        
-                    if member:
-                        if value['author'] == member.id:
-                            pass
-
-                        else:
-                            continue
-
-                    user = self.bot.get_user(value['author'])
-                    em.set_author(name=user,
-                                  icon_url=user.avatar_url)
-                    em.description = f"**Before** - {value['before']}\n" \
-                                     f"**After** - {value['after']}"
-                    em.timestamp = value['time']
-                    break
+        snipe = self.bot.edit_snipes.latest(
+            ctx.guild.id, channel.id if channel else None, member.id if member else None)
+        if snipe:
+            user = self.bot.get_user(snipe.author_id)
+            em.set_author(name=user,
+                          icon_url=user.avatar_url)
+            em.description = f"**Before** - {snipe.before}\n" \
+                             f"**After** - {snipe.content}"
+            em.timestamp = snipe.time
 
         await ctx.send(embed=em)
 
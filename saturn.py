@@ -1,6 +1,6 @@
 import json
-import logging
 import os
+import time
 from pathlib import Path
 
 import motor.motor_asyncio
@@ -10,43 +10,109 @@ import discord
 
 from assets import *
 
-logger = logging.getLogger('discord')
-logger.setLevel(logging.DEBUG)
+default_prefix = "s."
 
-formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(module)s | %(message)s")
 
-handler = logging.FileHandler(filename='saturn.log', encoding='utf-8', mode='w')
-handler.setFormatter(formatter)
+def prefixes_for(bot, message, data):
+    """
+    The prefixes a message can use, given its guild's config document
+    """
+    if not message.guild or not data or not data.get('prefix'):
+        return commands.when_mentioned_or(default_prefix)(bot, message)
 
-logger.addHandler(handler)
+    if isinstance(data['prefix'], str):
+        return commands.when_mentioned_or(data['prefix'])(bot, message)
 
-default_prefix = "s."
+    pre = flatten(data['prefix'])
+    return commands.when_mentioned_or(*pre)(bot, message)
 
 
 # noinspection PyShadowingNames, PyBroadException, SpellCheckingInspection
 async def get_prefix(bot, message):
     """
     For the bot's command_prefix. Not the same as the `retrieve_prefix` function.
+    Messages going through the pipeline already know their prefixes, see `Saturn.get_prefix`.
     """
-    # sphagetto code galore
-    if not message.guild: return commands.when_mentioned_or(default_prefix)(bot, message)
-    # noinspection PyUnusedLocal
     try:
-        data = await bot.config.find_one({"_id": message.guild.id})
+        data = await bot.config_cache.get(message.guild.id) if message.guild else None
 
-        if not data or not data['prefix']: return commands.when_mentioned_or(default_prefix)(bot, message)
+    # noinspection PyUnusedLocal
+    except Exception as e:
+        data = None
 
-        if isinstance(data['prefix'], str):
-            return commands.when_mentioned_or(data['prefix'])(bot, message)
+    return prefixes_for(bot, message, data)
 
-        pre = flatten(data['prefix'])
-        return commands.when_mentioned_or(*pre)(bot, message)
 
-    # noinspection PyUnusedLocal
-    except Exception as e:
-        return commands.when_mentioned_or(default_prefix)(bot, message)
+class Saturn(commands.Bot):
+    """
+    The bot itself. Anything that has to be cleaned up on shutdown gets closed in `close`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = Registry()
+        self.metrics_server = None
+        self.mod_buffer = None
+        self._listener_wrappers = {}
+
+        # every message goes through here, the cogs add their own stages in between these two
+        self.pipeline = MessagePipeline(self)
+        self.pipeline.add_stage('prefix', self._match_prefix, order=0)
+        self.pipeline.add_stage('commands', self._dispatch_command, order=100)
+
+    async def close(self):
+        if self.mod_buffer is not None:
+            await self.mod_buffer.close()  # before anything else, these are people's mod records
+
+        await self.web.close()
+        if self.metrics_server is not None:
+            await self.metrics_server.stop()
+
+        await super().close()
+        if self.log_listener is not None:
+            self.log_listener.stop()  # flush whatever's still queued
 
-bot = commands.Bot(
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        self.help_index.invalidate()
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        self.help_index.invalidate()
+
+    def add_listener(self, func, name=None):
+        # every listener gets timed, the wrapper is remembered so remove_listener still works
+        wrapper = self._listener_wrappers[func] = instrument_listener(self.metrics, func)
+        super().add_listener(wrapper, name or func.__name__)
+
+    def remove_listener(self, func, name=None):
+        super().remove_listener(self._listener_wrappers.pop(func, func), name or func.__name__)
+
+    async def on_message(self, message):
+        await self.pipeline.process(message)
+
+    async def get_prefix(self, message):
+        ctx = self.pipeline.context_for(message)
+        if ctx is not None and ctx.prefixes:
+            return ctx.prefixes
+
+        return await super().get_prefix(message)
+
+    async def _match_prefix(self, ctx):
+        ctx.prefixes = prefixes_for(self, ctx.message, ctx.config)
+        for prefix in ctx.prefixes:
+            if ctx.content.startswith(prefix):
+                ctx.prefix = prefix
+                rest = ctx.content[len(prefix):].split(maxsplit=1)
+                ctx.invoked = rest[0] if rest else ''
+                break
+
+    async def _dispatch_command(self, ctx):
+        if ctx.prefix is not None:
+            await self.process_commands(ctx.message)
+
+
+bot = Saturn(
     command_prefix=get_prefix,
     intents=discord.Intents.all(),
     case_insensitive=True,
@@ -56,11 +122,15 @@ bot.path = str(bot.path)
 bot.__version__ = '1.1.0'
 
 bot.configuration = json.load(open(bot.path + '/assets/config.json'))
+bot.log_listener = None
+bot.help_index = HelpIndex(bot)
+bot.user_resolver = UserResolver(bot)
+bot.web = HTTPClient(apis=bot.configuration.get('apis'), timeout=bot.configuration.get('http_timeout', 10))
 
 bot.muted_users = {}
 bot.banned_users = {}
-bot.snipes = {}
-bot.edit_snipes = {}
+bot.snipes = SnipeStore()
+bot.edit_snipes = SnipeStore()
 
 bot.config_token = bot.configuration['token']
 bot.connection_url = bot.configuration['mongo']
@@ -73,24 +143,11 @@ async def on_ready():
     print(f"------\nLogged in as {bot.user.name}"
           f" (ID {bot.user.id})\n------\nTime: {dt.now()}")
 
-    data = []
-    async for document in bot.mutes.find({}):
-        data.append(document)
-
-    for mute in data:
-        bot.muted_users[mute["_id"]] = mute
-
-    bans = []
-    async for document in bot.bans.find({}):
-        bans.append(document)
-
-    for ban in bans:
-        bot.banned_users[ban["_id"]] = ban
-
 
 @bot.event
 async def on_connect():
     change_pres.start()
+    refresh_blacklist.start()
     print("------\nSaturn connected")
 
 
@@ -98,6 +155,7 @@ async def on_connect():
 async def on_disconnect():
     print("------\nSaturn disconnected")
     change_pres.cancel()
+    refresh_blacklist.cancel()
 
 
 @tasks.loop(minutes=1)
@@ -105,25 +163,98 @@ async def change_pres():
     await bot.change_presence(
         activity=discord.Game(name=f"{default_prefix}help | V{bot.__version__}"))
 
+@tasks.loop(minutes=bot.configuration.get('blacklist_refresh_minutes', 5))
+async def refresh_blacklist():
+    # picks up blacklists made by other instances, the dev commands update it in place
+    await bot.blacklist.load()
+
 @bot.before_invoke
 async def blacklist_check(ctx):
-    if await bot.blacklists.find_one({"_id": ctx.author.id}) is not None:
+    ctx.invoke_started = time.perf_counter()
+    if await bot.blacklist.contains(ctx.author.id):
         raise Blacklisted
 
     else:
         pass
 
+
+command_timings = bot.metrics.histogram(
+    'saturn_command_seconds', 'Time taken by commands', ('command',))
+command_counts = bot.metrics.counter(
+    'saturn_commands_total', 'Commands invoked', ('command', 'status'))
+
+
+@bot.after_invoke
+async def record_command(ctx):
+    ctx.recorded = True
+    command = ctx.command.qualified_name
+    command_timings.observe(time.perf_counter() - ctx.invoke_started, command)
+    command_counts.inc(command, 'failed' if ctx.command_failed else 'ok')
+
+
+@bot.listen('on_command_error')
+async def record_command_error(ctx, exc):
+    # failing a check or argument conversion never gets as far as the after_invoke hook
+    if ctx.command is not None and not getattr(ctx, 'recorded', False):
+        command_counts.inc(ctx.command.qualified_name, 'failed')
+
+
+def cache_stats():
+    caches = {
+        'config': getattr(bot, 'config_cache', None),
+        'http': bot.web,
+        'users': bot.user_resolver,
+        'tags': bot.get_cog('Tags'),
+        'avatars': getattr(bot.get_cog('Fun'), 'duel_images', None),
+    }
+    return {name: (cache.hits, cache.misses) for name, cache in caches.items() if cache is not None}
+
+
+bot.metrics.gauge(
+    'saturn_mod_logs_pending', 'Mod log documents waiting to be written',
+    function=lambda: {(): len(bot.mod_buffer) if bot.mod_buffer is not None else 0})
+bot.metrics.gauge(
+    'saturn_gateway_latency_seconds', 'Heartbeat latency to the gateway',
+    function=lambda: {(): bot.latency})
+bot.metrics.gauge(
+    'saturn_cache_requests', 'Cache lookups so far', ('cache', 'result'),
+    function=lambda: {(name, result): count for name, counts in cache_stats().items()
+                      for result, count in zip(('hit', 'miss'), counts)})
+bot.metrics.gauge(
+    'saturn_cache_hit_ratio', 'Share of cache lookups that were hits', ('cache',),
+    function=lambda: {(name,): hits / (hits + misses) for name, (hits, misses) in cache_stats().items()
+                      if hits + misses})
+
 if __name__ == '__main__':
     """Load all of the cogs and initialize the databases"""
-    bot.mongo = motor.motor_asyncio.AsyncIOMotorClient(str(bot.connection_url))
+    bot.log_listener = setup_logging(bot.configuration.get('logging'))
+    bot.slow_queries = SlowQueryMonitor(bot.configuration.get('slow_query_ms', 100) / 1000, registry=bot.metrics)
+    bot.mongo = motor.motor_asyncio.AsyncIOMotorClient(str(bot.connection_url),
+                                                        event_listeners=[bot.slow_queries])
     bot.db = bot.mongo["saturn"]
     bot.config = bot.db["config"]
+    bot.config_cache = GuildConfigCache(bot.config)
     bot.mutes = bot.db["mutes"]
     bot.blacklists = bot.db["blacklists"]
+    bot.blacklist = Blacklist(bot.blacklists)
     bot.tags = bot.db["tags"]
     bot.mod = bot.db["mod"]
+    bot.mod_buffer = ModLogBuffer(bot.mod, interval=bot.configuration.get('mod_log_flush_interval', 1.0))
     bot.bans = bot.db["bans"]
     bot.starboard = bot.db["starboard"]
+    bot.counters = bot.db["counters"]
+    bot.jobs = bot.db["jobs"]
+    bot.schema = SchemaManager(bot.db)
+    bot.loop.create_task(bot.schema.run())
+    bot.bulk = BulkJobs(bot, bot.jobs, concurrency=bot.configuration.get('bulk_concurrency', 5))
+    bot.loop.create_task(bot.bulk.mark_interrupted())
+
+    metrics_config = bot.configuration.get('metrics', {})
+    if metrics_config.get('enabled', True):
+        bot.metrics_server = MetricsServer(bot.metrics, metrics_config.get('host', '127.0.0.1'),
+                                           metrics_config.get('port', 9100))
+        bot.loop.create_task(bot.metrics_server.start())
+        bot.loop.create_task(measure_loop_lag(bot.metrics))
 
     for file in os.listdir(bot.path + '/cogs'):
         if file.endswith('.py') and not file.startswith('_'):
@@ -0,0 +1,27 @@
+import importlib
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ASSETS = Path(__file__).parents[1] / 'assets'
+
+
+def load_asset(name):
+    """
+    Import a single assets module without running the package's __init__, which pulls in
+    discord and the rest of the bot that the helpers under test don't need.
+    Relative imports between assets modules still work.
+    """
+    if '_assets' not in sys.modules:
+        package = types.ModuleType('_assets')
+        package.__path__ = [str(ASSETS)]
+        sys.modules['_assets'] = package
+
+    return importlib.import_module(f'_assets.{name}')
+
+
+@pytest.fixture
+def assets():
+    return load_asset
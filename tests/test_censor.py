@@ -0,0 +1,24 @@
+import pytest
+
+
+@pytest.fixture
+def censor(assets):
+    return assets('censor').compile_censor(['fuck', 'shit', 'bad'])
+
+
+@pytest.mark.parametrize('text', [
+    'fuck', 'fuck!', 'shit!!', 'what the fuck?', 'bad-word', '$hit', 'sh!t', 'f.u.c.k', 'f u c k',
+    'fück', 'fuuuuck', 'SHIT.',
+])
+def test_catches(censor, text):
+    assert censor.contains_profanity(text)
+
+
+@pytest.mark.parametrize('text', ['hello!', 'shiitake', 'badge', 'as', 'i said hi!'])
+def test_ignores(censor, text):
+    assert not censor.contains_profanity(text)
+
+
+def test_trailing_punctuation_is_not_a_letter(assets):
+    variants = assets('censor').normalize_words('shit!')
+    assert ['shit'] in variants
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def links(assets):
+    return assets('links')
+
+
+@pytest.mark.parametrize('text, host', [
+    ('go to https://example.com/page', 'example.com'),
+    ('<https://www.example.co.uk>', 'www.example.co.uk'),
+    ('www.example.com', 'www.example.com'),
+    ('http://1.2.3.4/admin', '1.2.3.4'),
+    ('http://localhost:8080', 'localhost'),
+    ('see:https://user@localhost/x', 'localhost'),
+])
+def test_finds_links(links, text, host):
+    assert [link.host for link in links.find_links(text)] == [host]
+
+
+@pytest.mark.parametrize('text', [
+    'e.g. this', 'file.txt', 'version 1.2.3.4', 'localhost:8080', 'http://999.1.1.1/', 'ftp://example.com',
+])
+def test_ignores_non_links(links, text):
+    assert not links.has_link(text)
+
+
+def test_finds_invites(links):
+    invites = links.find_invites('join discord.gg/abc123 or https://discord.com/invite/xyz')
+    assert [invite.code for invite in invites] == ['abc123', 'xyz']
+
+
+def test_long_input_is_fast(links):
+    # the old regex took half a second on this
+    assert not links.has_link('a.' * 4000 + 'com')
+
+
+@pytest.mark.parametrize('chunk', ['a.', 'http://', 'www.', '<(', 'discord.gg/', 'example ', ':/.'])
+def test_scanning_is_linear(links, chunk):
+    def scan(repeats):
+        text = chunk * repeats
+        start = time.perf_counter()
+        links.find_links(text)
+        links.find_invites(text)
+        return time.perf_counter() - start
+
+    small, large = min(scan(2000) for _ in range(3)), min(scan(20000) for _ in range(3))
+    # ten times the input should take about ten times as long, the bounds are loose for slow machines
+    assert large < 2
+    assert large < max(small, 0.001) * 40
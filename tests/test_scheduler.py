@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime as dt, timedelta
+
+
+def test_overdue_expires_straight_away(assets):
+    expired = []
+
+    async def main():
+        async def callback(key):
+            expired.append(key)
+
+        scheduler = assets('scheduler').ExpiryScheduler(callback)
+        # loaded on startup, before the runner is going
+        scheduler.schedule(('mute', 1), dt.utcnow() - timedelta(hours=1))
+        scheduler.schedule(('ban', 2), dt.utcnow() + timedelta(hours=1))
+        await asyncio.sleep(0)
+        assert expired == [('mute', 1)]
+        assert ('ban', 2) in scheduler and ('mute', 1) not in scheduler
+
+    asyncio.run(main())
+
+
+def test_expires_in_order(assets):
+    expired = []
+
+    async def main():
+        async def callback(key):
+            expired.append(key)
+
+        scheduler = assets('scheduler').ExpiryScheduler(callback)
+        scheduler.start()
+        scheduler.schedule('later', dt.utcnow() + timedelta(seconds=0.1))
+        scheduler.schedule('sooner', dt.utcnow() + timedelta(seconds=0.05))
+        scheduler.schedule('cancelled', dt.utcnow() + timedelta(seconds=0.05))
+        scheduler.cancel('cancelled')
+        await asyncio.sleep(0.2)
+        scheduler.stop()
+
+    asyncio.run(main())
+    assert expired == ['sooner', 'later']
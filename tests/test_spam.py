@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def detector(assets):
+    return assets('spam').SpamDetector()
+
+
+def message(content):
+    return SimpleNamespace(guild=SimpleNamespace(id=1), author=SimpleNamespace(id=2), content=content)
+
+
+def test_repeats_are_spam(detector):
+    results = [detector.record(message('buy my stuff'), window=60, threshold=10) for _ in range(6)]
+    assert results[-1]
+
+
+def test_attachment_only_messages_are_not_repeats(detector):
+    results = [detector.record(message(''), window=60, threshold=10) for _ in range(6)]
+    assert not any(results)
+
+
+def test_too_many_messages_is_spam(detector):
+    results = [detector.record(message(str(n)), window=60, threshold=5) for n in range(6)]
+    assert results[-1] and not any(results[:-1])
+
+
+@pytest.mark.parametrize('threshold, allowed', [(10, 5), (5, 2), (3, 2)])
+def test_default_repeat_limit(detector, threshold, allowed):
+    # half the threshold, but never fewer than 2
+    results = [detector.record(message('hi'), window=60, threshold=threshold) for _ in range(allowed + 1)]
+    assert not any(results[:allowed]) and results[allowed]
+
+
+def test_repeat_limit_setting(detector):
+    results = [detector.record(message('hi'), window=60, threshold=10, repeats=3) for _ in range(4)]
+    assert not any(results[:3]) and results[3]
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+pytest.importorskip('discord')  # assets.cache needs it
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+
+
+class StandIn:
+    """
+    A local stand-in for an API, counting how often each route gets hit
+    """
+
+    def __init__(self):
+        self.hits = {}
+        self.failing = False
+        self.app = web.Application()
+        self.app.router.add_get('/fact', self.fact)
+        self.app.router.add_get('/slow', self.slow)
+
+    async def fact(self, request):
+        self.hits['fact'] = self.hits.get('fact', 0) + 1
+        if self.failing:
+            return web.Response(status=500)
+
+        return web.json_response({"fact": f"fact #{self.hits['fact']}"})
+
+    async def slow(self, request):
+        await asyncio.sleep(1)
+        return web.json_response({})
+
+
+def run(assets, test, **kwargs):
+    async def main():
+        stand_in = StandIn()
+        async with TestServer(stand_in.app) as server:
+            client = assets('web').HTTPClient(apis={'test': str(server.make_url('/'))}, **kwargs)
+            try:
+                await test(client, stand_in)
+
+            finally:
+                await client.close()
+
+    asyncio.run(main())
+
+
+def test_cache_hit(assets):
+    async def test(client, stand_in):
+        url = client.url('test', '/fact')
+        first = await client.get_json(url, ttl=60)
+        second = await client.get_json(url, ttl=60)
+        assert first == second == (200, {"fact": "fact #1"})
+        assert stand_in.hits['fact'] == 1
+        assert client.hits == 1
+
+    run(assets, test)
+
+
+def test_cache_expiry_and_stale_if_error(assets):
+    async def test(client, stand_in):
+        url = client.url('test', '/fact')
+        await client.get_json(url, ttl=0.05)
+        await asyncio.sleep(0.1)
+        assert await client.get_json(url, ttl=0.05) == (200, {"fact": "fact #2"})
+
+        # once it's expired and the API falls over, the stale copy is better than nothing
+        await asyncio.sleep(0.1)
+        stand_in.failing = True
+        assert await client.get_json(url, ttl=0.05) == (200, {"fact": "fact #2"})
+        assert await client.get_json(client.url('test', '/fact?uncached')) == (500, None)
+
+    run(assets, test)
+
+
+def test_timeout_is_503(assets):
+    async def test(client, stand_in):
+        assert await client.get_json(client.url('test', '/slow')) == (503, None)
+
+    run(assets, test, timeout=0.2)
+
+
+def test_one_shared_session(assets):
+    async def test(client, stand_in):
+        session = client.session
+        results = await client.gather_json(*(client.url('test', f'/fact?n={n}') for n in range(5)))
+        assert [status for status, data in results] == [200] * 5
+        assert client.session is session
+
+    run(assets, test)